@@ -0,0 +1,152 @@
+"""
+Benchmark /health latency while /search requests are in flight.
+
+Runs the real app under uvicorn with stub searchers that block like the
+upstream clients do (time.sleep stands in for .execute() / .call() /
+requests.get), then polls /health while a batch of concurrent /search
+requests is running.
+
+    python benchHealth.py                 # compare inline vs executor
+    python benchHealth.py --mode executor --searches 32 --upstream-delay 1.5
+
+"inline" reproduces the old behaviour of calling the searchers directly from
+the async handler; "executor" uses the bounded upstream executor.
+"""
+
+import argparse
+import logging
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import uvicorn  # noqa: E402
+
+import server_  # noqa: E402
+from searchCache import ResultCache  # noqa: E402
+from videoRecord import VideoRecord  # noqa: E402
+
+
+class _SlowYouTube:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def search_shorts_page(self, prompt, max_results=50, **kwargs):
+        time.sleep(self.delay)
+        videos = [
+            VideoRecord(
+                video_id=f"yt{i}",
+                title=prompt,
+                watch_url=f"https://www.youtube.com/shorts/yt{i}",
+                embed_url=f"https://www.youtube.com/embed/yt{i}",
+                source="youtube",
+            )
+            for i in range(max_results)
+        ]
+        return videos, None
+
+
+class _SlowTikTok:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def search_videos_page(self, query, max_results=25, **kwargs):
+        time.sleep(self.delay * 2)
+        return [], None
+
+
+class _InlineExecutor:
+    # Pre-executor behaviour: the blocking clients run on the event loop.
+    async def run(self, source, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(url: str) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run(mode: str, searches: int, delay: float, probes: int) -> dict:
+    server_.get_youtube_searcher = lambda: _SlowYouTube(delay)
+    server_.get_tiktok_searcher = lambda: _SlowTikTok(delay)
+    # Every search must reach the stub upstream, so start from an empty,
+    # memory-only result cache.
+    server_.result_cache = ResultCache({}, path=None)
+    original = server_.get_source_executor
+    if mode == "inline":
+        server_.get_source_executor = _InlineExecutor
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(server_.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with ThreadPoolExecutor(max_workers=searches) as pool:
+            pending = [
+                pool.submit(_get, f"{base}/search?query=python+{i}&max_results=10")
+                for i in range(searches)
+            ]
+            time.sleep(0.1)
+            health = []
+            for _ in range(probes):
+                health.append(_get(f"{base}/health"))
+                time.sleep(0.05)
+            search = [future.result() for future in pending]
+    finally:
+        server.should_exit = True
+        thread.join()
+        server_.get_source_executor = original
+
+    health_ms = sorted(value * 1000 for value in health)
+    return {
+        "mode": mode,
+        "health_p50_ms": statistics.median(health_ms),
+        "health_p95_ms": health_ms[int(0.95 * (len(health_ms) - 1))],
+        "health_max_ms": health_ms[-1],
+        "search_wall_s": max(search),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=["inline", "executor", "both"], default="both")
+    parser.add_argument("--searches", type=int, default=16)
+    parser.add_argument("--upstream-delay", type=float, default=0.5)
+    parser.add_argument("--probes", type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # Keep every search in the measurement instead of timing sources out.
+    server_.SEARCH_DEADLINE_SECONDS = 120
+    modes = ["inline", "executor"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        result = run(mode, args.searches, args.upstream_delay, args.probes)
+        print(
+            f"{result['mode']:>9}: /health p50={result['health_p50_ms']:.1f}ms "
+            f"p95={result['health_p95_ms']:.1f}ms max={result['health_max_ms']:.1f}ms "
+            f"| slowest /search {result['search_wall_s']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
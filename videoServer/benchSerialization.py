@@ -0,0 +1,120 @@
+"""
+Benchmark /search response serialization.
+
+Compares the old path, where each record became a VideoResponse inside a
+VideoListResponse that FastAPI then validated and serialized again through
+the route's response_model field, with the pre-encoded path in
+jsonResponse. The pre-encoded path is timed with orjson (when installed)
+and with the json module fallback. Reports the cost per returned video.
+
+    python benchSerialization.py
+    python benchSerialization.py --results 50 --rounds 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import jsonResponse  # noqa: E402
+from server_ import VideoListResponse, VideoResponse, app  # noqa: E402
+from videoRecord import VideoRecord  # noqa: E402
+
+
+def _records(count: int):
+    return [
+        VideoRecord(
+            video_id=f"vid{i:08d}",
+            title=f"Learn Python in 60 seconds #{i} #shorts",
+            watch_url=f"https://www.youtube.com/shorts/vid{i:08d}",
+            embed_url=f"https://www.youtube.com/embed/vid{i:08d}",
+            source="youtube",
+        )
+        for i in range(count)
+    ]
+
+
+SEARCH_ROUTE = next(route for route in app.routes if route.path == "/search")
+
+
+def _pydantic(videos):
+    model = VideoListResponse(
+        videos=[VideoResponse(**video.to_dict()) for video in videos],
+        count=len(videos),
+        query="python",
+        timed_out_sources=[],
+        next_cursor=None,
+        seen_filtered=0,
+    )
+    # What fastapi.routing.serialize_response does with a returned model for
+    # an async endpoint, rendered by the default response class.
+    field = SEARCH_ROUTE.response_field
+    value, errors = field.validate(model, {}, loc=("response",))
+    assert not errors, errors
+    content = field.serialize(value, by_alias=True)
+    return JSONResponse(content).body
+
+
+def _fast(videos, accept_encoding=None):
+    return jsonResponse.json_response(
+        {
+            "videos": [video.to_dict() for video in videos],
+            "count": len(videos),
+            "query": "python",
+            "optimized_query": None,
+            "timed_out_sources": [],
+            "next_cursor": None,
+            "seen_filtered": 0,
+        },
+        accept_encoding,
+    ).body
+
+
+def _time(fn, rounds: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--results", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    videos = _records(args.results)
+    cases = [("pydantic + response_model", None, lambda: _pydantic(videos))]
+    encoders = ["orjson", "json"] if jsonResponse.orjson is not None else ["json"]
+    for encoder in encoders:
+        cases += [
+            (f"pre-encoded [{encoder}]", encoder, lambda: _fast(videos)),
+            (f"  + gzip [{encoder}]", encoder, lambda: _fast(videos, "gzip")),
+        ]
+        if jsonResponse.brotli is not None:
+            cases.append((f"  + br [{encoder}]", encoder, lambda: _fast(videos, "br")))
+
+    print(f"{args.results} results, {args.rounds} rounds")
+    orjson = jsonResponse.orjson
+    baseline = None
+    for name, encoder, fn in cases:
+        # The json-module rows show what a deployment without orjson gets.
+        jsonResponse.orjson = None if encoder == "json" else orjson
+        seconds = _time(fn, args.rounds)
+        size = len(fn())
+        baseline = baseline or seconds
+        print(
+            f"  {name:<26} {seconds * 1e6:8.1f} us/response"
+            f"  {seconds * 1e6 / args.results:6.2f} us/item"
+            f"  {size:6d} bytes  x{baseline / seconds:.1f}"
+        )
+    jsonResponse.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
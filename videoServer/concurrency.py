@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SourceExecutor:
+    """
+    Bounded thread pool for the blocking upstream clients (googleapiclient,
+    Gemini, Apify, requests) so they never run on the event loop.
+
+    Each source also gets its own concurrency cap, so one slow upstream can
+    only tie up its share of the pool instead of starving the others.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        source_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            max_workers: Total worker threads shared by all sources
+            source_limits: Per-source cap on concurrently running calls
+        """
+        self.max_workers = max_workers
+        self.source_limits = dict(source_limits or {})
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="upstream"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, source: str) -> Optional[asyncio.Semaphore]:
+        limit = self.source_limits.get(source)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(source)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[source] = semaphore
+        return semaphore
+
+    async def run(self, source: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking call for a source on the pool.
+
+        The per-source slot is held until the worker thread actually finishes,
+        even if the awaiting request gives up on it earlier.
+        """
+        semaphore = self._semaphore(source)
+        if semaphore is not None:
+            await semaphore.acquire()
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            future = loop.run_in_executor(
+                self._executor,
+                functools.partial(context.run, fn, *args, **kwargs),
+            )
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+
+        if semaphore is not None:
+            future.add_done_callback(lambda _: semaphore.release())
+
+        # Shield so a cancelled caller does not release the slot while the
+        # thread is still talking to the upstream.
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "source_limits": self.source_limits,
+        }
+
+    def shutdown(self):
+        logger.info("Shutting down upstream executor")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls onto one shared task.
+
+    While a call for a key is in flight, further callers for the same key
+    await its result instead of starting their own upstream work.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await the shared call for key, starting it with factory() if needed.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._finished, key))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight call for %s", key)
+
+        # Shield so one caller hitting its deadline does not cancel the call
+        # for everyone else sharing it.
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller gave up.
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._in_flight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
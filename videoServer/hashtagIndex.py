@@ -0,0 +1,217 @@
+"""
+Durable Instagram hashtag -> hashtag ID index.
+
+Hashtag IDs never change, so each one only needs ig_hashtag_search once.
+The Graph API also limits an account to 30 unique hashtag lookups per
+rolling 7 days; the index records every lookup it lets through so that
+budget is tracked across restarts and shared by the workers on the host.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqliteStore import ThreadLocalSQLite
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_LOOKUP_WINDOW_SECONDS = 7 * 24 * 3600
+
+
+class HashtagIndex:
+    """
+    SQLite-backed hashtag ID index with an in-memory copy in front of it.
+
+    A hashtag the API had no match for is stored with an empty ID, so it is
+    not looked up (and charged against the budget) again.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lookup_limit: int = 30,
+        window_seconds: float = HASHTAG_LOOKUP_WINDOW_SECONDS,
+    ):
+        """
+        Args:
+            path: SQLite file holding the index and the lookup log
+            lookup_limit: Unique hashtag lookups allowed per window
+            window_seconds: Length of the rolling lookup window
+        """
+        self.path = path
+        self.lookup_limit = lookup_limit
+        self.window_seconds = window_seconds
+        self.hits = 0
+        self.misses = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+        self._memory: Dict[str, str] = {}
+        self._db = ThreadLocalSQLite(path)
+        connection = self._db.connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashtags ("
+            " hashtag TEXT PRIMARY KEY,"
+            " hashtag_id TEXT NOT NULL,"
+            " resolved_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " hashtag TEXT PRIMARY KEY,"
+            " looked_up_at REAL NOT NULL)"
+        )
+        self._memory.update(
+            connection.execute("SELECT hashtag, hashtag_id FROM hashtags").fetchall()
+        )
+
+    def get(self, hashtag: str) -> Optional[str]:
+        """
+        Return the known ID for a hashtag, "" if it is known to have no
+        match, or None if it has never been resolved.
+        """
+        hashtag_id = self.peek(hashtag)
+        with self._lock:
+            if hashtag_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return hashtag_id
+
+    def peek(self, hashtag: str) -> Optional[str]:
+        """Like get(), without counting towards the hit rate."""
+        hashtag_id = self._memory.get(hashtag)
+        if hashtag_id is None:
+            # Another worker may have resolved it since we loaded the index.
+            row = (
+                self._db.connection()
+                .execute(
+                    "SELECT hashtag_id FROM hashtags WHERE hashtag = ?", (hashtag,)
+                )
+                .fetchone()
+            )
+            if row is not None:
+                hashtag_id = row[0]
+                self._memory[hashtag] = hashtag_id
+        return hashtag_id
+
+    def set(self, hashtag: str, hashtag_id: Optional[str]):
+        hashtag_id = hashtag_id or ""
+        self._memory[hashtag] = hashtag_id
+        self._db.connection().execute(
+            "INSERT OR REPLACE INTO hashtags (hashtag, hashtag_id, resolved_at)"
+            " VALUES (?, ?, ?)",
+            (hashtag, hashtag_id, time.time()),
+        )
+
+    def reserve_lookup(self, hashtag: str) -> bool:
+        """
+        Record an ig_hashtag_search call for hashtag if the budget allows it.
+
+        Repeating a hashtag already looked up inside the window is free, as it
+        is for the Graph API.
+
+        Returns:
+            False if the call would exceed the rolling lookup limit
+        """
+        now = time.time()
+        connection = self._db.connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM lookups WHERE looked_up_at < ?",
+                (now - self.window_seconds,),
+            )
+            seen = connection.execute(
+                "SELECT 1 FROM lookups WHERE hashtag = ?", (hashtag,)
+            ).fetchone()
+            if seen is None:
+                (used,) = connection.execute("SELECT COUNT(*) FROM lookups").fetchone()
+                if used >= self.lookup_limit:
+                    with self._lock:
+                        self.denied += 1
+                    return False
+                connection.execute(
+                    "INSERT INTO lookups (hashtag, looked_up_at) VALUES (?, ?)",
+                    (hashtag, now),
+                )
+        return True
+
+    def lookups_used(self) -> int:
+        (used,) = (
+            self._db.connection()
+            .execute(
+                "SELECT COUNT(*) FROM lookups WHERE looked_up_at >= ?",
+                (time.time() - self.window_seconds,),
+            )
+            .fetchone()
+        )
+        return used
+
+    def lookups_remaining(self) -> int:
+        return max(0, self.lookup_limit - self.lookups_used())
+
+    def load_seed(self, seed_path: str) -> int:
+        """
+        Preload hashtag IDs from a JSON object mapping hashtag to ID.
+
+        Seeded entries do not count against the lookup budget.
+
+        Returns:
+            Number of hashtags loaded
+        """
+        with open(seed_path, encoding="utf-8") as f:
+            seed = json.load(f)
+        if not isinstance(seed, dict):
+            raise ValueError("Hashtag seed file must be a JSON object")
+
+        now = time.time()
+        rows = [
+            (str(hashtag).lstrip("#").lower(), str(hashtag_id), now)
+            for hashtag, hashtag_id in seed.items()
+            if hashtag_id
+        ]
+        connection = self._db.connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO hashtags (hashtag, hashtag_id, resolved_at)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+        self._memory.update((hashtag, hashtag_id) for hashtag, hashtag_id, _ in rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        used = self.lookups_used()
+        with self._lock:
+            return {
+                "indexed": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "lookups_used": used,
+                "lookups_remaining": max(0, self.lookup_limit - used),
+                "lookup_limit": self.lookup_limit,
+                "window_seconds": self.window_seconds,
+                "denied": self.denied,
+            }
+
+
+def open_hashtag_index(
+    path: Optional[str], lookup_limit: int, seed_path: Optional[str] = None
+) -> Optional[HashtagIndex]:
+    if not path:
+        return None
+    try:
+        index = HashtagIndex(path, lookup_limit=lookup_limit)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Hashtag index disabled ({path}): {e}")
+        return None
+    if seed_path:
+        try:
+            loaded = index.load_seed(seed_path)
+            logger.info(f"Loaded {loaded} hashtag IDs from {seed_path}")
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.error(f"Failed to load hashtag seed file {seed_path}: {e}")
+    return index
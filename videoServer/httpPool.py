@@ -0,0 +1,121 @@
+import logging
+import socket
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class _Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+
+def _counting_pool(pool_cls, counter: _Counter):
+    """Pool class whose connections count every TCP (and TLS) connect."""
+
+    class CountingConnection(pool_cls.ConnectionCls):
+        def connect(self):
+            counter.increment()
+            super().connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": CountingConnection})
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that counts requests sent and connections opened, including
+    reconnects of pooled connections the server dropped, so connection
+    reuse can be checked from the outside.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._requests = _Counter()
+        self._connections = _Counter()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._connections),
+            "https": _counting_pool(HTTPSConnectionPool, self._connections),
+        }
+
+    def send(self, request, *args, **kwargs):
+        self._requests.increment()
+        return super().send(request, *args, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self._requests.value,
+            "connections_opened": self._connections.value,
+        }
+
+
+class HTTPPool:
+    """
+    Shared keep-alive HTTP session for the REST-based searchers.
+
+    Owned by the app lifespan so TCP+TLS connections to the Graph API (and
+    any other REST upstream) are reused across requests instead of being
+    set up on every call.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        keepalive: bool = True,
+    ):
+        """
+        Args:
+            pool_connections: Number of per-host connection pools to keep
+            pool_maxsize: Connections kept open per host
+            keepalive: Enable TCP keep-alive probes on pooled connections so idle
+                ones are not silently dropped by NATs and load balancers
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self.adapter = CountingHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        if keepalive:
+            socket_options = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+            self.adapter.init_poolmanager(
+                pool_connections,
+                pool_maxsize,
+                block=False,
+                socket_options=socket_options,
+            )
+
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def stats(self) -> Dict[str, Any]:
+        totals = self.adapter.stats()
+        reused = max(0, totals["requests"] - totals["connections_opened"])
+        return {
+            **totals,
+            "reused": reused,
+            "reuse_ratio": reused / totals["requests"] if totals["requests"] else 0.0,
+            "pool_maxsize": self.pool_maxsize,
+            "keepalive": self.keepalive,
+        }
+
+    def close(self):
+        logger.info("Closing shared HTTP session")
+        self.session.close()
@@ -0,0 +1,105 @@
+"""
+Pre-encoded JSON responses for the hot endpoints.
+
+Handlers that already hold plain, normalized records can encode them once,
+straight to bytes, instead of building pydantic models that FastAPI then
+validates and serializes a second time through response_model. Returning a
+Response skips that step while the decorator's response_model still
+documents the shape in OpenAPI.
+
+orjson (pinned in requirements.txt) does the encoding; the json module is
+only a fallback for environments without it, at several times the cost.
+Bodies large enough to benefit are compressed with brotli or gzip according
+to the client's Accept-Encoding.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - not installed
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+# Smaller bodies fit in a packet or two; compressing them only costs CPU.
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(value: Any) -> bytes:
+    """Encode value as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick "br", "gzip" or None (identity) for an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def json_response(
+    payload: Any,
+    accept_encoding: Optional[str] = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Encode payload once and wrap it in a Response.
+
+    Args:
+        payload: JSON-ready value (dicts, lists, strings, numbers, None)
+        accept_encoding: The request's Accept-Encoding header, if any
+        status_code: HTTP status of the response
+    """
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        coding = choose_encoding(accept_encoding)
+        if coding == "br":
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif coding == "gzip":
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
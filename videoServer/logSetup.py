@@ -0,0 +1,153 @@
+"""
+Logging setup for the video server.
+
+Records are handed to a queue on the calling thread and written to stderr
+by a QueueListener thread, so request handlers and upstream workers never
+block on log I/O. Below WARNING, only a sample of requests log at all
+(LOG_SAMPLE_RATE); warnings and errors are always kept.
+
+Environment:
+    LOG_LEVEL: Root level name (default INFO)
+    LOG_FORMAT: "text" or "json" (one JSON object per line)
+    LOG_SAMPLE_RATE: Share of requests whose sub-WARNING records are kept
+"""
+
+import atexit
+import contextvars
+import copy
+import dataclasses
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from typing import Any, Optional, Tuple
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "log_request_id", default=None
+)
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "log_sampled", default=True
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sample_rate = 1.0
+
+
+def _json_default(value: Any) -> Any:
+    # Result records (VideoRecord) log as objects rather than their repr.
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return str(value)
+
+
+class LazyJson:
+    """Defer json.dumps of a payload until a handler actually formats it."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=_json_default, separators=(",", ":"))
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Drop sub-WARNING records from requests that were not sampled."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps a record's traceback out of its message.
+
+    The stock prepare() folds the formatted traceback into msg and clears
+    exc_info, which left JSON records with the traceback inside "message".
+    Here it is rendered into exc_text instead, still on the calling thread so
+    the queue holds no frames; the output formatter appends it to text lines
+    or gives it its own JSON field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Install the queue-backed root handler once, from the environment."""
+    global _listener, _sample_rate
+    if _listener is not None:
+        return
+
+    _sample_rate = min(1.0, max(0.0, float(os.getenv("LOG_SAMPLE_RATE", "1"))))
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    output = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = TracebackQueueHandler(log_queue)
+    handler.addFilter(RequestSamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def begin_request() -> Tuple[contextvars.Token, contextvars.Token]:
+    """Tag the current request's records and decide whether it is sampled."""
+    sampled = _sample_rate >= 1.0 or random.random() < _sample_rate
+    return (
+        _request_id.set(uuid.uuid4().hex[:12]),
+        _sampled.set(sampled),
+    )
+
+
+def end_request(tokens: Tuple[contextvars.Token, contextvars.Token]):
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _sampled.reset(sampled_token)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchScheduler:
+    """
+    Keeps the result cache warm for recently popular searches.
+
+    Every first-page search is recorded with an exponentially decaying
+    popularity score. A background loop periodically refreshes the most
+    popular entries that are close to expiring, so the requests that follow
+    are served from cache instead of waiting on a cold upstream run.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[Any], Awaitable[Any]],
+        interval: float = 60.0,
+        top_n: int = 20,
+        min_score: float = 2.0,
+        half_life: float = 3600.0,
+        max_tracked: int = 512,
+    ):
+        """
+        Args:
+            refresh: Coroutine function that re-fetches and caches one entry,
+                called with the payload passed to record()
+            interval: Seconds between prefetch passes
+            top_n: Most popular entries considered on each pass
+            min_score: Decayed request count an entry needs to be prefetched
+            half_life: Seconds for an entry's popularity to halve
+            max_tracked: Entries tracked before the least popular are dropped
+        """
+        self.refresh = refresh
+        self.interval = interval
+        self.top_n = top_n
+        self.min_score = min_score
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self.prefetched = 0
+        self.failed = 0
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _decayed(self, entry: Dict[str, Any], now: float) -> float:
+        elapsed = now - entry["updated_at"]
+        return entry["score"] * math.pow(0.5, elapsed / self.half_life)
+
+    def record(self, key: Hashable, payload: Any, refresh_after: float):
+        """
+        Count a request for key.
+
+        Args:
+            key: Result cache key of the searched page
+            payload: Passed to refresh() when the entry is prefetched
+            refresh_after: Seconds after a fetch before the entry is due again
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"score": 0.0, "updated_at": now, "fetched_at": now}
+                self._entries[key] = entry
+            entry["score"] = self._decayed(entry, now) + 1.0
+            entry["updated_at"] = now
+            entry["payload"] = payload
+            entry["refresh_after"] = refresh_after
+            if len(self._entries) > self.max_tracked:
+                coldest = min(
+                    self._entries, key=lambda k: self._decayed(self._entries[k], now)
+                )
+                del self._entries[coldest]
+
+    def mark_fetched(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["fetched_at"] = time.time()
+
+    def due(self) -> List[Any]:
+        """Payloads of the popular entries that should be refreshed now."""
+        now = time.time()
+        with self._lock:
+            ranked = sorted(
+                self._entries.values(),
+                key=lambda entry: self._decayed(entry, now),
+                reverse=True,
+            )[: self.top_n]
+            return [
+                entry["payload"]
+                for entry in ranked
+                if self._decayed(entry, now) >= self.min_score
+                and now - entry["fetched_at"] >= entry["refresh_after"]
+            ]
+
+    async def run_once(self):
+        payloads = self.due()
+        if not payloads:
+            return
+        logger.info("Prefetching %d popular searches", len(payloads))
+        outcomes = await asyncio.gather(
+            *(self.refresh(payload) for payload in payloads), return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                self.failed += 1
+                logger.warning("Prefetch failed: %s", outcome)
+            else:
+                self.prefetched += 1
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch pass failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            popular = sum(
+                1
+                for entry in self._entries.values()
+                if self._decayed(entry, now) >= self.min_score
+            )
+            return {
+                "tracked": len(self._entries),
+                "popular": popular,
+                "prefetched": self.prefetched,
+                "failed": self.failed,
+                "interval": self.interval,
+            }
@@ -0,0 +1,123 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Common English stopwords plus the filler people put around a topic when
+# they type a feed prompt ("I want ...", "please show me ..."). Words that can
+# carry the topic themselves (learn, new, best, video, ...) are kept.
+STOPWORDS = frozenset("""
+    a about above after again against all also am an and any are aren't as at
+    be because been before being below between both but by can can't cannot
+    could couldn't did didn't do does doesn't doing don't down during each few
+    for from further had hadn't has hasn't have haven't
+    having he her here hers herself him himself his how i i'd i'll i'm i've if
+    in into is isn't it it's its itself just let's like me more most much must
+    my myself no nor not now of off on once only or other ought our ours
+    ourselves out over own really same she should shouldn't so some something
+    such than that that's the their theirs them themselves then there there's
+    these they they're this those through to too under until up very was
+    wasn't we we're were weren't what what's when where which while who whom
+    why will with won't would wouldn't you you'd you'll you're you've your
+    yours yourself yourselves
+    want wanna need please show tell maybe
+    """.split())
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9'+#.-]*[a-z0-9+#]|[a-z0-9]")
+_BREAK = re.compile(r"[,;:!?()\[\]{}\"/|]+|\.(?:\s+|$)")
+
+
+class LocalQueryExpander:
+    """
+    Deterministic, in-process alternative to the Gemini topic generator.
+
+    Candidate queries are the stopword-free runs of the prompt, scored
+    RAKE-style (word degree / frequency) with a small bonus for runs that
+    appear early. A lone word left between stopwords is usually a modifier or
+    a generic verb ("learn", "beginners"), so single-word runs only become
+    queries when the prompt has no longer one.
+    """
+
+    def __init__(self, max_words: int = 6):
+        """
+        Args:
+            max_words: Longest query to emit (matches the Gemini prompt's 1-6 words)
+        """
+        self.max_words = max_words
+
+    def _phrases(self, prompt: str) -> List[List[str]]:
+        """Split the prompt into maximal runs of non-stopword tokens."""
+        phrases: List[List[str]] = []
+        for segment in _BREAK.split(prompt.casefold()):
+            current: List[str] = []
+            for token in _TOKEN.findall(segment):
+                if token in STOPWORDS or len(token) < 2 and not token.isdigit():
+                    if current:
+                        phrases.append(current)
+                        current = []
+                else:
+                    current.append(token)
+            if current:
+                phrases.append(current)
+        return phrases
+
+    def keyphrases(self, prompt: str) -> List[Tuple[str, float]]:
+        """
+        Score candidate keyphrases for a prompt.
+
+        Returns:
+            List of (phrase, score) tuples, best first
+        """
+        phrases = self._phrases(prompt)
+        if not phrases:
+            return []
+
+        frequency: Dict[str, int] = defaultdict(int)
+        degree: Dict[str, int] = defaultdict(int)
+        for phrase in phrases:
+            for word in phrase:
+                frequency[word] += 1
+                degree[word] += len(phrase)
+        word_score = {word: degree[word] / frequency[word] for word in frequency}
+
+        total = sum(len(phrase) for phrase in phrases)
+        scores: Dict[str, float] = {}
+        offset = 0
+        for phrase in phrases:
+            words = phrase[: self.max_words]
+            position_bonus = 1.0 + 0.5 * (1.0 - offset / total)
+            score = sum(word_score[word] for word in words) * position_bonus
+            text = " ".join(words)
+            if score > scores.get(text, 0.0):
+                scores[text] = score
+            offset += len(phrase)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def expand(self, prompt: str, num_topics: int = 4) -> List[str]:
+        """
+        Generate up to num_topics short search queries for a prompt.
+
+        Falls back to the stripped prompt when nothing but stopwords is left.
+        """
+        candidates = self.keyphrases(prompt)
+        if not candidates:
+            fallback = " ".join(prompt.split()[: self.max_words])
+            return [fallback] if fallback else []
+
+        if any(" " in text for text, _ in candidates):
+            candidates = [(text, score) for text, score in candidates if " " in text]
+
+        chosen: List[str] = []
+        for text, _ in candidates:
+            if len(chosen) >= num_topics:
+                break
+            # A phrase inside an existing query (or containing one) would
+            # search for nearly the same videos again at full quota cost.
+            padded = f" {text} "
+            if any(
+                padded in f" {other} " or f" {other} " in padded for other in chosen
+            ):
+                continue
+            chosen.append(text)
+
+        return chosen
@@ -22,20 +22,124 @@ INSTALLATION INSTRUCTIONS:
 """
 
 import logging
+import math
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from typing import List, Dict, Optional
+from googleapiclient.http import build_http
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 import google.generativeai as genai
 import random
 import json
 
+from queryExpansion import LocalQueryExpander
+from searchCache import TTLCache, normalize_query
+from logSetup import LazyJson
+from telemetry import in_context, stage
+from youtubeQuota import QUOTA_COSTS, QuotaLedger
+from videoRecord import VideoRecord
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# videos.list accepts at most 50 comma-separated IDs per call.
+VIDEOS_LIST_BATCH_SIZE = 50
+
+# Largest maxResults search.list accepts.
+SEARCH_LIST_MAX_RESULTS = 50
+
+# Partial-response masks: only the fields the searcher reads come back, not
+# descriptions, every thumbnail size and localized snippets.
+SEARCH_LIST_FIELDS = "nextPageToken,items(id/videoId)"
+VIDEOS_LIST_FIELDS = "items(id,snippet/title,contentDetails/duration)"
+
+ISO_DURATION = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+# How a prompt is turned into search topics: Gemini, the in-process keyphrase
+# expander, or the raw prompt as a single topic.
+EXPANDERS = ("gemini", "local", "none")
+
+
+def _short_record(video_id: str, title: str) -> VideoRecord:
+    return VideoRecord(
+        video_id=video_id,
+        title=title,
+        watch_url=f"https://www.youtube.com/shorts/{video_id}",
+        embed_url=f"https://www.youtube.com/embed/{video_id}",
+        source="youtube",
+    )
+
+
+def _page_state(
+    topics: List[str], tokens: Dict[str, str], carried: List[VideoRecord]
+) -> Optional[Dict]:
+    """
+    State for the next page, or None when nothing is left to return.
+
+    Shorts found beyond a page's max_results are carried as (id, title)
+    pairs: the page tokens have already moved past them.
+    """
+    if not tokens and not carried:
+        return None
+    state = {"topics": topics, "tokens": tokens}
+    if carried:
+        state["carry"] = [[short.video_id, short.title] for short in carried]
+    return state
+
+
+class ShortsYieldTracker:
+    """
+    Exponentially weighted share of search.list results that turn out to be
+    Shorts (≤60 seconds) once their durations are known.
+
+    videoDuration="short" matches anything under 4 minutes, so the share
+    varies a lot between topics. Topics seen before use their own average;
+    new ones start from the average over all topics.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        prior: float = 0.5,
+        floor: float = 0.1,
+        maxsize: int = 2048,
+    ):
+        """
+        Args:
+            alpha: Weight of the newest observation
+            prior: Yield assumed before anything has been observed
+            floor: Lowest yield used for sizing, so one bad page cannot ask for 50
+            maxsize: Topics whose yield is remembered
+        """
+        self.alpha = alpha
+        self.floor = floor
+        self.overall = prior
+        self._topics = TTLCache(maxsize=maxsize, ttl=24 * 3600)
+        self._lock = threading.Lock()
+
+    def estimate(self, topic: str) -> float:
+        return self._topics.get(normalize_query(topic), self.overall)
+
+    def observe(self, topic: str, returned: int, shorts: int):
+        if not returned:
+            return
+        observed = shorts / returned
+        key = normalize_query(topic)
+        with self._lock:
+            current = self._topics.get(key, self.overall)
+            self._topics.set(key, current + self.alpha * (observed - current))
+            self.overall += self.alpha * (observed - self.overall)
+
+    def request_size(self, topic: str, wanted: int) -> int:
+        """maxResults expected to produce `wanted` Shorts for this topic."""
+        ratio = max(self.floor, self.estimate(topic))
+        return max(1, min(SEARCH_LIST_MAX_RESULTS, math.ceil(max(1, wanted) / ratio)))
+
 
 class YouTubeShortsSearcher:
     """
@@ -43,16 +147,52 @@ class YouTubeShortsSearcher:
     Includes Gemini Flash for generating multiple search topics and aggregating results.
     """
 
-    def __init__(self, api_key: str, gemini_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        gemini_api_key: Optional[str] = None,
+        topic_concurrency: int = 4,
+        topic_cache: Optional[TTLCache] = None,
+        default_expander: str = "gemini",
+        quota: Optional[QuotaLedger] = None,
+        request_quota_budget: Optional[int] = None,
+        max_fill_rounds: int = 1,
+        yield_tracker: Optional["ShortsYieldTracker"] = None,
+    ):
         """
         Initialize the YouTube Shorts searcher.
 
         Args:
             api_key: Your YouTube Data API v3 key
             gemini_api_key: Your Gemini API key (optional, for prompt optimization)
+            topic_concurrency: Worker threads shared by all searches for topic and
+                duration lookups, i.e. the most YouTube calls in flight at once
+            topic_cache: Cache of prompt -> Gemini topics (defaults to a 6h LRU)
+            default_expander: Topic expander used when a search does not pick one
+            quota: Ledger the API calls are charged to (defaults to an in-memory one)
+            request_quota_budget: Default cap on the quota units one search may spend
+            max_fill_rounds: Extra search.list rounds a page may make to reach max_results
+            yield_tracker: Observed Shorts yield per topic, used to size maxResults
         """
+        if default_expander not in EXPANDERS:
+            raise ValueError(f"Unknown expander '{default_expander}'")
         self.api_key = api_key
         self.youtube = build("youtube", "v3", developerKey=api_key)
+        self.topic_concurrency = max(1, topic_concurrency)
+        self._local = threading.local()
+        # Long-lived workers keep their per-thread Http (and its kept-alive
+        # connection) across searches, and bound the YouTube calls in flight
+        # from all searches together.
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.topic_concurrency, thread_name_prefix="yt-topic"
+        )
+        self.topic_cache = topic_cache or TTLCache(maxsize=512, ttl=6 * 3600)
+        self.default_expander = default_expander
+        self.local_expander = LocalQueryExpander()
+        self.quota = quota or QuotaLedger()
+        self.request_quota_budget = request_quota_budget
+        self.max_fill_rounds = max(0, max_fill_rounds)
+        self.yield_tracker = yield_tracker or ShortsYieldTracker()
 
         # Initialize Gemini if API key is provided
         self.gemini_enabled = False
@@ -70,6 +210,10 @@ class YouTubeShortsSearcher:
         """
         Use Gemini to generate multiple search topics from a user prompt.
 
+        Falls back to searching the prompt as-is when Gemini is unavailable
+        or its answer cannot be used; the local expander only runs when it is
+        selected explicitly (expander="local").
+
         Args:
             user_prompt: Natural language prompt from user
             num_topics: Number of search topics to generate (default: 3)
@@ -80,6 +224,13 @@ class YouTubeShortsSearcher:
         if not self.gemini_enabled:
             return [user_prompt]
 
+        # Feeds re-run the same prompt on every refill, so reuse the expansion.
+        cache_key = (normalize_query(user_prompt), num_topics)
+        cached_topics = self.topic_cache.get(cache_key)
+        if cached_topics is not None:
+            logger.info("[Gemini] Reusing cached topics for '%s'", user_prompt)
+            return list(cached_topics)
+
         system_instruction = f"""You are a YouTube search optimizer. 
 Given a user's prompt, generate {num_topics} different search queries that will help find diverse and relevant YouTube Shorts.
 
@@ -103,9 +254,10 @@ User: "I need workout routines for beginners"
 You: ["beginner workout", "home fitness", "exercise tutorial"]"""
 
         try:
-            response = self.model.generate_content(
-                f"{system_instruction}\n\nUser: {user_prompt}\nYou:"
-            )
+            with stage("gemini", "youtube", user_prompt):
+                response = self.model.generate_content(
+                    f"{system_instruction}\n\nUser: {user_prompt}\nYou:"
+                )
 
             # Extract JSON from response
             response_text = response.text.strip()
@@ -117,11 +269,14 @@ You: ["beginner workout", "home fitness", "exercise tutorial"]"""
 
             topics = json.loads(response_text)
             logger.info(
-                f"[Gemini] Generated {len(topics)} search topics from '{user_prompt}':"
+                "[Gemini] Generated %d search topics from '%s':",
+                len(topics),
+                user_prompt,
             )
             for i, topic in enumerate(topics, 1):
-                logger.info(f"  {i}. {topic}")
+                logger.info("  %d. %s", i, topic)
 
+            self.topic_cache.set(cache_key, tuple(topics))
             return topics
 
         except Exception as e:
@@ -129,165 +284,416 @@ You: ["beginner workout", "home fitness", "exercise tutorial"]"""
             # Fallback to single search with original prompt
             return [user_prompt]
 
-    def _search_single_topic(self, query: str, max_results: int = 15) -> List[Dict]:
+    def _expand_prompt(
+        self, prompt: str, num_topics: int, expander: Optional[str] = None
+    ) -> List[str]:
+        """
+        Turn a prompt into search topics with the selected expander.
+
+        Args:
+            prompt: Natural language prompt from user
+            num_topics: Number of search topics to generate
+            expander: "gemini", "local" or "none" (default: self.default_expander)
+
+        Returns:
+            List of search keywords/topics
+        """
+        expander = expander or self.default_expander
+        if expander == "gemini":
+            return self._generate_search_topics(prompt, num_topics)
+        if expander == "local":
+            topics = self.local_expander.expand(prompt, num_topics)
+            logger.info("[Local] Expanded '%s' into %s", prompt, topics)
+            return topics
+        return [prompt]
+
+    def _http(self):
         """
-        Search for YouTube Shorts for a single topic.
+        Return the httplib2 connection for the current thread.
+
+        The Http object shared by the discovery client is not thread-safe, so
+        requests issued from the topic workers each execute on their own. The
+        workers live as long as the searcher, so each Http keeps its
+        connection open between searches.
+        """
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = build_http()
+            self._local.http = http
+        return http
+
+    def close(self):
+        """Stop the topic workers (and with them their connections)."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _search_single_topic(
+        self, query: str, max_results: int = 15, page_token: Optional[str] = None
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        Search for candidate Shorts IDs for a single topic.
+
+        Durations are resolved later in batches across all topics, see
+        _fetch_shorts.
 
         Args:
             query: Search query
             max_results: Maximum number of results
+            page_token: search.list continuation token from a previous page
 
         Returns:
-            List of video dictionaries
+            Tuple of (candidate video IDs, token for the next page or None)
         """
         try:
-            logger.debug(f"Searching for topic: {query}")
+            logger.debug("Searching for topic: %s", query)
+            self.quota.charge("search.list")
             # Search for short videos
-            search_response = (
-                self.youtube.search()
-                .list(
-                    q=query,
-                    part="id,snippet",
-                    type="video",
-                    videoDuration="short",
-                    maxResults=max_results,
+            with stage("yt_search", "youtube", query):
+                search_response = (
+                    self.youtube.search()
+                    .list(
+                        q=query,
+                        part="id",
+                        fields=SEARCH_LIST_FIELDS,
+                        type="video",
+                        videoDuration="short",
+                        maxResults=max_results,
+                        pageToken=page_token,
+                    )
+                    .execute(http=self._http())
                 )
-                .execute()
-            )
-            logger.debug(f"search_response: {json.dumps(search_response, indent=2)}")
 
             video_ids = [
                 item["id"]["videoId"]
-                for item in search_response.get("items", [])
-                if "id" in item and "videoId" in item["id"]
+                for item in search_response.get("items", ())
+                if "videoId" in item.get("id", ())
             ]
 
-            logger.debug(f"video_ids: {video_ids}")
+            logger.debug("video_ids: %s", video_ids)
+            return video_ids, search_response.get("nextPageToken")
 
-            if not video_ids:
-                return []
+        except HttpError as e:
+            self._check_quota_error(e)
+            logger.error(f"An HTTP error occurred for query '{query}': {e}")
+            return [], None
+        except Exception as e:
+            logger.error(f"An unexpected error occurred for query '{query}': {e}")
+            return [], None
 
-            # Get video duration to filter actual Shorts (≤60 seconds)
-            videos_response = (
-                self.youtube.videos()
-                .list(part="snippet,contentDetails", id=",".join(video_ids))
-                .execute()
-            )
+    def _check_quota_error(self, error: HttpError):
+        if error.resp.status == 403 and b"quotaExceeded" in (error.content or b""):
+            self.quota.mark_exhausted()
 
-            shorts = []
-            for video in videos_response.get("items", []):
-                try:
-                    # Safely extract video details with fallbacks
-                    video_id = video.get("id")
-                    if not video_id:
-                        continue
-
-                    duration = video.get("contentDetails", {}).get("duration")
-                    if not duration:
-                        continue
-
-                    duration_seconds = self._parse_duration(duration)
-
-                    # Only include videos 60 seconds or less (actual Shorts)
-                    if duration_seconds <= 60:
-                        title = video.get("snippet", {}).get("title", "Untitled")
-                        shorts.append(
-                            {
-                                "video_id": video_id,
-                                "title": title,
-                                "watch_url": f"https://www.youtube.com/shorts/{video_id}",
-                                "embed_url": f"https://www.youtube.com/embed/{video_id}",
-                            }
-                        )
-                except (KeyError, TypeError) as e:
-                    # Skip malformed video entries
-                    logger.warning(f"Skipping malformed video entry: {e}")
-                    continue
+    def _fetch_shorts(self, video_ids: List[str]) -> List[VideoRecord]:
+        """
+        Resolve durations for up to VIDEOS_LIST_BATCH_SIZE IDs in one
+        videos.list call and keep the actual Shorts (≤60 seconds).
 
-            return shorts
+        Args:
+            video_ids: Candidate video IDs
 
+        Returns:
+            List of video dictionaries
+        """
+        if not video_ids:
+            return []
+
+        try:
+            self.quota.charge("videos.list")
+            with stage("yt_videos", "youtube", f"{len(video_ids)} ids"):
+                videos_response = (
+                    self.youtube.videos()
+                    .list(
+                        part="snippet,contentDetails",
+                        fields=VIDEOS_LIST_FIELDS,
+                        id=",".join(video_ids),
+                    )
+                    .execute(http=self._http())
+                )
         except HttpError as e:
-            logger.error(f"An HTTP error occurred for query '{query}': {e}")
+            self._check_quota_error(e)
+            logger.error(
+                f"An HTTP error occurred looking up {len(video_ids)} videos: {e}"
+            )
             return []
         except Exception as e:
-            logger.error(f"An unexpected error occurred for query '{query}': {e}")
+            logger.error(
+                f"An unexpected error occurred looking up {len(video_ids)} videos: {e}"
+            )
             return []
 
+        shorts = []
+        for video in videos_response.get("items", ()):
+            try:
+                # Safely extract video details with fallbacks
+                video_id = video.get("id")
+                if not video_id:
+                    continue
+
+                duration = video.get("contentDetails", {}).get("duration")
+                if not duration:
+                    continue
+
+                duration_seconds = self._parse_duration(duration)
+
+                # Only include videos 60 seconds or less (actual Shorts)
+                if duration_seconds <= 60:
+                    title = video.get("snippet", {}).get("title", "Untitled")
+                    shorts.append(_short_record(video_id, title))
+            except (KeyError, TypeError) as e:
+                # Skip malformed video entries
+                logger.warning(f"Skipping malformed video entry: {e}")
+                continue
+
+        return shorts
+
     def search_shorts(
         self,
         prompt: str,
         max_results: int = 50,
         optimize_prompt: bool = True,
         num_topics: int = 5,
-    ) -> List[Dict]:
+        expander: Optional[str] = None,
+    ) -> List[VideoRecord]:
         """
         Search for YouTube Shorts based on a prompt using multiple search topics.
 
         Args:
             prompt: Search query/prompt (can be natural language if Gemini is enabled)
             max_results: Total maximum number of results to return (default: 50)
-            optimize_prompt: Whether to use Gemini to generate multiple topics (default: True)
+            optimize_prompt: Whether to expand the prompt into multiple topics (default: True)
             num_topics: Number of search topics to generate if optimizing (default: 4)
+            expander: Topic expander to use, one of EXPANDERS (default: self.default_expander)
 
         Returns:
             List of dictionaries with video_id, title, and playback URLs (mixed from all topics)
         """
-        try:
-            # Generate multiple search topics if Gemini is enabled
-            if optimize_prompt and self.gemini_enabled:
-                search_topics = self._generate_search_topics(prompt, num_topics)
-            else:
-                search_topics = [prompt]
+        results, _ = self.search_shorts_page(
+            prompt,
+            max_results,
+            optimize_prompt=optimize_prompt,
+            num_topics=num_topics,
+            expander=expander,
+        )
+        return results
+
+    def search_shorts_page(
+        self,
+        prompt: str,
+        max_results: int = 50,
+        optimize_prompt: bool = True,
+        num_topics: int = 5,
+        expander: Optional[str] = None,
+        page_state: Optional[Dict] = None,
+        quota_budget: Optional[int] = None,
+    ) -> Tuple[List[VideoRecord], Optional[Dict]]:
+        """
+        Search one page of YouTube Shorts, returning the state for the next one.
 
-            if not search_topics:
-                logger.info("[Search] No search topics generated")
-                return []
+        The first page expands the prompt into topics. Later pages reuse the
+        topics stored in page_state and only follow the search.list page
+        tokens of topics that still have more results. Shorts found beyond
+        max_results are carried in the state and returned first next time.
 
-            # Calculate results per topic (add buffer for deduplication)
-            results_per_topic = max(1, (max_results // len(search_topics)) + 3)
+        Args:
+            prompt: Search query/prompt (can be natural language if Gemini is enabled)
+            max_results: Total maximum number of results to return (default: 50)
+            optimize_prompt: Whether to expand the prompt into multiple topics (default: True)
+            num_topics: Number of search topics to generate if optimizing (default: 4)
+            expander: Topic expander to use, one of EXPANDERS (default: self.default_expander)
+            page_state: State returned with the previous page (None for the first page)
+            quota_budget: Quota units this search may spend; capped at, and
+                defaulting to, self.request_quota_budget.
+                Topics beyond what the budget or the remaining daily quota allows
+                are dropped, and only one topic is searched once the quota runs low.
 
-            # Search each topic
+        Returns:
+            Tuple of (videos, state for the next page or None when exhausted)
+        """
+        try:
+            carried = []
+            if page_state:
+                tokens = page_state.get("tokens") or {}
+                search_topics = [
+                    topic for topic in page_state.get("topics", []) if tokens.get(topic)
+                ]
+                carried = [
+                    _short_record(video_id, title)
+                    for video_id, title in page_state.get("carry", ())
+                ]
+            else:
+                tokens = {}
+                # Generate multiple search topics unless optimization is off
+                if optimize_prompt:
+                    search_topics = self._expand_prompt(prompt, num_topics, expander)
+                else:
+                    search_topics = [prompt]
+
+            if not search_topics and not carried:
+                logger.info("[Search] No search topics to search")
+                return [], None
+            if len(carried) >= max_results or not search_topics:
+                return carried[:max_results], _page_state(
+                    search_topics, tokens, carried[max_results:]
+                )
+            wanted = max_results - len(carried)
+
+            if quota_budget is None:
+                quota_budget = self.request_quota_budget
+            elif self.request_quota_budget is not None:
+                # A caller may lower the server's cap, never raise it.
+                quota_budget = min(quota_budget, self.request_quota_budget)
+            affordable = self.quota.affordable_topics(len(search_topics), quota_budget)
+            if affordable < len(search_topics):
+                logger.warning(
+                    "[Quota] Searching %d of %d topics (%d units left today)",
+                    affordable,
+                    len(search_topics),
+                    self.quota.remaining(),
+                )
+                if not affordable:
+                    # Keep the state so the feed can continue after the reset.
+                    return carried, _page_state(search_topics, tokens, [])
+            all_topics = search_topics
+            search_topics = search_topics[:affordable]
+
+            # Each topic is asked for enough candidates to yield its share of
+            # Shorts at the ratio observed for it so far.
+            per_topic_target = -(-wanted // len(search_topics))
+            budget_left = quota_budget
+            shorts_by_topic = {topic: 0 for topic in search_topics}
+            seen_video_ids = {short.video_id for short in carried}
+            next_tokens = {}
             all_results = []
-            seen_video_ids = set()  # Track duplicates across topics
+            lookups = 0
+
+            round_topics = search_topics
+            round_tokens = tokens
+            # Topics are searched concurrently on the searcher's shared pool;
+            # dedup runs afterwards in topic order so the result is the same as
+            # a sequential search.
+            pool = self._pool
+            for fill_round in range(self.max_fill_rounds + 1):
+                sizes = {
+                    topic: self.yield_tracker.request_size(
+                        topic, per_topic_target - shorts_by_topic[topic]
+                    )
+                    for topic in round_topics
+                }
+                logger.info(
+                    "[Search] Round %d: searching %d topics, %s",
+                    fill_round + 1,
+                    len(round_topics),
+                    sizes,
+                )
+                per_topic_pages = list(
+                    pool.map(
+                        in_context(
+                            lambda topic: self._search_single_topic(
+                                topic, sizes[topic], round_tokens.get(topic)
+                            )
+                        ),
+                        round_topics,
+                    )
+                )
+                if budget_left is not None:
+                    budget_left -= QUOTA_COSTS["search.list"] * len(round_topics)
+
+                candidate_ids = []
+                owners = {}
+                returned = {}
+                for topic, (topic_ids, next_token) in zip(
+                    round_topics, per_topic_pages
+                ):
+                    if next_token:
+                        next_tokens[topic] = next_token
+                    else:
+                        next_tokens.pop(topic, None)
+                    returned[topic] = len(topic_ids)
+
+                    # Filter out duplicates before spending a lookup on them
+                    for video_id in topic_ids:
+                        if video_id not in seen_video_ids:
+                            candidate_ids.append(video_id)
+                            seen_video_ids.add(video_id)
+                            owners[video_id] = topic
+
+                    logger.info(
+                        "[Search] Topic '%s': %d candidates (%d unique this round)",
+                        topic,
+                        len(topic_ids),
+                        len(candidate_ids),
+                    )
+
+                # Resolve durations for every topic at once, 50 IDs per call.
+                batches = [
+                    candidate_ids[i : i + VIDEOS_LIST_BATCH_SIZE]
+                    for i in range(0, len(candidate_ids), VIDEOS_LIST_BATCH_SIZE)
+                ]
+                lookups += len(batches)
+                if budget_left is not None:
+                    budget_left -= QUOTA_COSTS["videos.list"] * len(batches)
+                round_shorts = {topic: 0 for topic in round_topics}
+                for batch_shorts in pool.map(in_context(self._fetch_shorts), batches):
+                    for short in batch_shorts:
+                        all_results.append(short)
+                        owner = owners.get(short.video_id)
+                        if owner is not None:
+                            round_shorts[owner] += 1
+
+                for topic in round_topics:
+                    shorts_by_topic[topic] += round_shorts[topic]
+                    self.yield_tracker.observe(
+                        topic, returned[topic], round_shorts[topic]
+                    )
+
+                if len(all_results) >= wanted:
+                    break
+                # Follow the page tokens of the topics that fell short
+                # rather than leaving the client to ask for another page.
+                round_topics = [
+                    topic
+                    for topic in search_topics
+                    if topic in next_tokens
+                    and shorts_by_topic[topic] < per_topic_target
+                ]
+                round_topics = round_topics[
+                    : self.quota.affordable_topics(len(round_topics), budget_left)
+                ]
+                if not round_topics:
+                    break
+                round_tokens = dict(next_tokens)
 
             logger.info(
-                f"\n[Search] Searching {len(search_topics)} topics, ~{results_per_topic} results each..."
+                "[Search] %d shorts from %d videos.list call(s)",
+                len(all_results),
+                lookups,
             )
-
-            for topic in search_topics:
-                logger.info(f"[Search] Topic: '{topic}'")
-                topic_results = self._search_single_topic(topic, results_per_topic)
-                logger.info(json.dumps(topic_results, indent=2))
-
-                # Filter out duplicates
-                for video in topic_results:
-                    if video["video_id"] not in seen_video_ids:
-                        all_results.append(video)
-                        seen_video_ids.add(video["video_id"])
-
-                logger.info(
-                    f"[Search] Found {len(topic_results)} shorts ({len(all_results)} unique total)"
-                )
+            logger.debug("[Search] Results: %s", LazyJson(all_results))
 
             # Shuffle to mix results from different topics
             random.shuffle(all_results)
 
             # Limit to max_results
+            all_results = carried + all_results
             final_results = all_results[:max_results]
 
-            logger.info(f"\n[Search] Returning {len(final_results)} mixed results\n")
+            logger.info("[Search] Returning %d mixed results", len(final_results))
+
+            # Topics skipped to save quota keep their place for the next page.
+            for topic in all_topics[affordable:]:
+                if tokens.get(topic):
+                    next_tokens[topic] = tokens[topic]
 
-            return final_results
+            return final_results, _page_state(
+                all_topics, next_tokens, all_results[max_results:]
+            )
         except Exception as e:
             logger.error(f"[Search] Error during search: {e}")
-            return []
+            return [], None
 
     def _parse_duration(self, duration: str) -> int:
         """Parse ISO 8601 duration format to seconds."""
-        import re
-
-        pattern = r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?"
-        match = re.match(pattern, duration)
+        match = ISO_DURATION.match(duration)
 
         if not match:
             return 0
@@ -310,7 +716,7 @@ You: ["beginner workout", "home fitness", "exercise tutorial"]"""
         Returns:
             HTML iframe embed code
         """
-        return f'''<iframe 
+        return f"""<iframe 
     width="{width}" 
     height="{height}" 
     src="https://www.youtube.com/embed/{video_id}" 
@@ -318,9 +724,9 @@ You: ["beginner workout", "home fitness", "exercise tutorial"]"""
     frameborder="0" 
     allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share" 
     allowfullscreen>
-</iframe>'''
+</iframe>"""
 
-    def print_results(self, shorts: List[Dict]):
+    def print_results(self, shorts: List[VideoRecord]):
         """Print search results with playback URLs."""
         if not shorts:
             logger.info("No YouTube Shorts found for this search.")
@@ -328,9 +734,9 @@ You: ["beginner workout", "home fitness", "exercise tutorial"]"""
 
         logger.info(f"\nFound {len(shorts)} YouTube Shorts:\n")
         for i, short in enumerate(shorts, 1):
-            logger.info(f"{i}. {short['title']}")
-            logger.info(f"   Watch: {short['watch_url']}")
-            logger.info(f"   Embed: {short['embed_url']}")
+            logger.info(f"{i}. {short.title}")
+            logger.info(f"   Watch: {short.watch_url}")
+            logger.info(f"   Embed: {short.embed_url}")
             logger.info("")
 
 
@@ -356,4 +762,4 @@ if __name__ == "__main__":
     # Example: Get embed code for the first result
     if results:
         logger.info("\nEmbed code for first video:")
-        logger.info(searcher.get_embed_html(results[0]["video_id"]))
+        logger.info(searcher.get_embed_html(results[0].video_id))
@@ -0,0 +1,283 @@
+import asyncio
+import dataclasses
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from sqliteStore import ThreadLocalSQLite
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a prompt for use as a cache key.
+
+    Case, punctuation and runs of whitespace are ignored, so
+    "Python  tutorials!" and "python tutorials" share an entry.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _json_default(value: Any) -> Any:
+    # Records (e.g. VideoRecord) are stored as bare field lists; the caller
+    # rebuilds them on read.
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return [getattr(value, field.name) for field in dataclasses.fields(value)]
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after a TTL.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedResult(NamedTuple):
+    value: Any
+    age: float
+    fresh: bool
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by SQLite in WAL mode, so entries survive
+    restarts and can be read by every uvicorn worker on the host while one
+    of them writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = ThreadLocalSQLite(path)
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " stored_at REAL NOT NULL,"
+            " value TEXT NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[tuple]:
+        row = (
+            self._db.connection()
+            .execute("SELECT stored_at, value FROM results WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, value: Any, stored_at: float):
+        self._db.connection().execute(
+            "INSERT OR REPLACE INTO results (key, stored_at, value) VALUES (?, ?, ?)",
+            (
+                key,
+                stored_at,
+                json.dumps(value, separators=(",", ":"), default=_json_default),
+            ),
+        )
+
+    def prune(self, older_than: float):
+        self._db.connection().execute(
+            "DELETE FROM results WHERE stored_at < ?", (older_than,)
+        )
+
+
+class ResultCache:
+    """
+    Two-tier cache for upstream search results: an in-memory LRU in front of
+    an optional SQLite tier.
+
+    Each source has its own TTL. Entries past their TTL are still returned
+    as stale for a further stale_ttl seconds so the caller can serve them
+    immediately and refresh in the background (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        stale_ttl: float = 3600.0,
+        memory_size: int = 1024,
+        path: Optional[str] = None,
+        default_ttl: float = 900.0,
+    ):
+        """
+        Args:
+            ttls: Fresh lifetime in seconds per source
+            stale_ttl: Extra seconds an expired entry may be served while refreshing
+            memory_size: Number of entries kept in the in-memory tier
+            path: SQLite file for the on-disk tier (None keeps the cache in memory)
+            default_ttl: TTL for sources missing from ttls
+        """
+        self.ttls = dict(ttls)
+        self.stale_ttl = stale_ttl
+        self.default_ttl = default_ttl
+        max_age = max([default_ttl, *self.ttls.values()]) + stale_ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=max_age)
+        self.disk: Optional[SQLiteCache] = None
+        if path:
+            try:
+                self.disk = SQLiteCache(path)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Result cache disk tier disabled ({path}): {e}")
+        self._max_age = max_age
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0}
+        )
+
+    @staticmethod
+    def key(source: str, query: str, limit: int, variant: str = "") -> str:
+        return "\x1f".join((source, normalize_query(query), str(limit), variant))
+
+    def ttl_for(self, source: str) -> float:
+        return self.ttls.get(source, self.default_ttl)
+
+    def _count(self, source: str, counter: str):
+        with self._lock:
+            self._counters[source][counter] += 1
+
+    def _needs_disk(self, source: str, entry: Optional[tuple], now: float) -> bool:
+        # Another worker may have refreshed the entry on disk already.
+        return self.disk is not None and (
+            entry is None or now - entry[0] > self.ttl_for(source)
+        )
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        try:
+            return self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache disk read failed: {e}")
+            return None
+
+    def _resolve(
+        self,
+        source: str,
+        key: str,
+        entry: Optional[tuple],
+        disk_entry: Optional[tuple],
+        now: float,
+    ) -> Optional[CachedResult]:
+        tier = "memory_hits"
+        if disk_entry is not None and (entry is None or disk_entry[0] > entry[0]):
+            entry = disk_entry
+            tier = "disk_hits"
+            self.memory.set(key, entry)
+
+        if entry is not None:
+            stored_at, value = entry
+            age = now - stored_at
+            ttl = self.ttl_for(source)
+            if age <= ttl:
+                self._count(source, tier)
+                return CachedResult(value, age, True)
+            if age <= ttl + self.stale_ttl:
+                self._count(source, "stale_hits")
+                return CachedResult(value, age, False)
+
+        self._count(source, "misses")
+        return None
+
+    def get(self, source: str, key: str) -> Optional[CachedResult]:
+        now = time.time()
+        entry = self.memory.get(key)
+        disk_entry = None
+        if self._needs_disk(source, entry, now):
+            disk_entry = self._read_disk(key)
+        return self._resolve(source, key, entry, disk_entry, now)
+
+    async def get_async(self, source: str, key: str) -> Optional[CachedResult]:
+        """
+        get() for the event loop: fresh memory hits are answered inline and
+        only a disk read is handed to a worker thread.
+        """
+        now = time.time()
+        entry = self.memory.get(key)
+        disk_entry = None
+        if self._needs_disk(source, entry, now):
+            disk_entry = await asyncio.to_thread(self._read_disk, key)
+        return self._resolve(source, key, entry, disk_entry, now)
+
+    def set(self, source: str, key: str, value: Any):
+        stored_at = time.time()
+        self.memory.set(key, (stored_at, value))
+        if self.disk is None:
+            return
+        try:
+            self.disk.set(key, value, stored_at)
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 500 == 0
+            if prune:
+                self.disk.prune(stored_at - self._max_age)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = {
+                source: dict(counts) for source, counts in self._counters.items()
+            }
+        return {
+            "memory": self.memory.stats(),
+            "disk_path": self.disk.path if self.disk else None,
+            "sources": sources,
+        }
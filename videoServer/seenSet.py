@@ -0,0 +1,132 @@
+"""
+Compact "already seen" sets for /search.
+
+A video is identified by a 32-bit digest: the first four bytes of
+SHA-1(video_id), read as a big-endian unsigned integer. A seen set travels
+as the sorted digests, delta-encoded as unsigned LEB128 varints and then
+base64url-encoded without padding. That is about 3-4 bytes per video, so a
+feed with a thousand seen videos fits in a query string.
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Set
+
+from sqliteStore import ThreadLocalSQLite
+
+logger = logging.getLogger(__name__)
+
+
+def video_digest(video_id: str) -> int:
+    return int.from_bytes(hashlib.sha1(video_id.encode()).digest()[:4], "big")
+
+
+def encode_seen(digests: Iterable[int]) -> str:
+    out = bytearray()
+    previous = 0
+    for digest in sorted(set(digests)):
+        delta = digest - previous
+        previous = digest
+        while True:
+            byte = delta & 0x7F
+            delta >>= 7
+            if delta:
+                out.append(byte | 0x80)
+            else:
+                out.append(byte)
+                break
+    return base64.urlsafe_b64encode(bytes(out)).decode().rstrip("=")
+
+
+def decode_seen(token: str) -> Set[int]:
+    """
+    Decode a token produced by encode_seen.
+
+    Raises:
+        ValueError: If the token is not valid base64url or ends mid-varint
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except binascii.Error as e:
+        raise ValueError(f"Invalid seen set: {e}") from e
+
+    digests: Set[int] = set()
+    value = 0
+    shift = 0
+    previous = 0
+    for byte in raw:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            if shift > 35:
+                raise ValueError("Invalid seen set: varint too long")
+            continue
+        previous += value
+        digests.add(previous)
+        value = 0
+        shift = 0
+    if shift:
+        raise ValueError("Invalid seen set: truncated varint")
+    return digests
+
+
+class SeenStore:
+    """
+    Server-side seen sets keyed by a client-chosen feed key, kept in SQLite
+    so they survive restarts and are shared by the workers on the host.
+    """
+
+    def __init__(self, path: str, max_per_feed: int = 5000):
+        """
+        Args:
+            path: SQLite file holding the seen sets
+            max_per_feed: Most recent digests kept per feed; older ones are dropped
+        """
+        self.path = path
+        self.max_per_feed = max_per_feed
+        self._db = ThreadLocalSQLite(path)
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " feed_key TEXT NOT NULL,"
+            " digest INTEGER NOT NULL,"
+            " added_at REAL NOT NULL,"
+            " PRIMARY KEY (feed_key, digest))"
+        )
+
+    def get(self, feed_key: str) -> Set[int]:
+        rows = self._db.connection().execute(
+            "SELECT digest FROM seen WHERE feed_key = ?", (feed_key,)
+        )
+        return {row[0] for row in rows}
+
+    def add(self, feed_key: str, digests: List[int]):
+        if not digests:
+            return
+        now = time.time()
+        connection = self._db.connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO seen (feed_key, digest, added_at) VALUES (?, ?, ?)",
+                [(feed_key, digest, now) for digest in digests],
+            )
+            connection.execute(
+                "DELETE FROM seen WHERE feed_key = ? AND digest NOT IN ("
+                " SELECT digest FROM seen WHERE feed_key = ?"
+                " ORDER BY added_at DESC LIMIT ?)",
+                (feed_key, feed_key, self.max_per_feed),
+            )
+
+
+def open_seen_store(path: Optional[str], max_per_feed: int) -> Optional[SeenStore]:
+    if not path:
+        return None
+    try:
+        return SeenStore(path, max_per_feed=max_per_feed)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Seen store disabled ({path}): {e}")
+        return None
@@ -1,15 +1,24 @@
 import sys
 import os
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
+import json
 import logging
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 base_dir = Path(__file__).resolve().parent
@@ -21,13 +30,211 @@ sys.path.append(str(base_dir / "AIVideos"))
 load_dotenv(dotenv_path=repo_root / ".env.local")
 load_dotenv(dotenv_path=repo_root / ".env")
 
+from logSetup import begin_request, configure_logging, end_request
+
+# Configure logging (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE)
+configure_logging()
+
+from concurrency import SingleFlight, SourceExecutor
+from hashtagIndex import open_hashtag_index
+from httpPool import HTTPPool
+from jsonResponse import dumps, json_response
+from prefetch import PrefetchScheduler
+from searchCache import ResultCache, normalize_query
+from seenSet import decode_seen, open_seen_store, video_digest
+from telemetry import (
+    REQUEST_SECONDS,
+    STAGE_ERRORS,
+    STAGE_SECONDS,
+    render_samples,
+    stage,
+    start_collecting,
+    stop_collecting,
+)
+from videoRecord import VideoRecord
+
+# Blocking upstream clients run on a bounded pool instead of the event loop,
+# with a per-source cap so one slow upstream cannot take every worker.
+source_executor = None
+
+
+def get_source_executor():
+    global source_executor
+    if source_executor is None:
+        source_executor = SourceExecutor(
+            max_workers=int(os.getenv("SEARCH_EXECUTOR_WORKERS", "16")),
+            source_limits={
+                "youtube": int(os.getenv("YOUTUBE_MAX_CONCURRENCY", "6")),
+                "tiktok": int(os.getenv("TIKTOK_MAX_CONCURRENCY", "4")),
+                "instagram": int(os.getenv("INSTAGRAM_MAX_CONCURRENCY", "4")),
+            },
+        )
+    return source_executor
+
+
+# One keep-alive session shared by the REST searchers (Instagram Graph API),
+# so TCP and TLS setup is paid once per connection instead of per request.
+http_pool = None
+
+
+def get_http_pool():
+    global http_pool
+    if http_pool is None:
+        http_pool = HTTPPool(
+            pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "20")),
+            keepalive=os.getenv("HTTP_KEEPALIVE", "true").lower()
+            in ("1", "true", "yes"),
+        )
+    return http_pool
+
+
+# Instagram hashtag -> ID index, so recent_media skips ig_hashtag_search and
+# the 30-lookups-per-week budget is tracked across restarts.
+hashtag_index = None
+
+
+def get_hashtag_index():
+    global hashtag_index
+    if hashtag_index is None:
+        hashtag_index = open_hashtag_index(
+            os.getenv(
+                "INSTAGRAM_HASHTAG_INDEX_PATH", "/tmp/reelearners/hashtags.sqlite3"
+            ),
+            lookup_limit=int(os.getenv("INSTAGRAM_HASHTAG_LOOKUP_LIMIT", "30")),
+            seed_path=os.getenv("INSTAGRAM_HASHTAG_INDEX_SEED"),
+        )
+    return hashtag_index
+
+
+# Upstream results are cached per (source, normalized query, limit) in memory
+# and in a SQLite file shared by the workers on this host.
+result_cache = None
+background_tasks: Set[asyncio.Task] = set()
+
+# Concurrent identical (source, query, limit) lookups share one upstream call.
+search_flights = SingleFlight()
+
+# Popular first-page searches for these sources are re-fetched in the
+# background before their cache entries expire, so feeds rarely wait on a
+# cold scrape. Empty PREFETCH_SOURCES disables prefetching.
+PREFETCH_SOURCES = {
+    source.strip()
+    for source in os.getenv("PREFETCH_SOURCES", "tiktok").split(",")
+    if source.strip()
+}
+PREFETCH_REFRESH_FRACTION = float(os.getenv("PREFETCH_REFRESH_FRACTION", "0.75"))
+prefetcher = None
+
+
+def get_prefetcher():
+    global prefetcher
+    if prefetcher is None:
+        prefetcher = PrefetchScheduler(
+            _prefetch,
+            interval=float(os.getenv("PREFETCH_INTERVAL_SECONDS", "60")),
+            top_n=int(os.getenv("PREFETCH_TOP_N", "20")),
+            min_score=float(os.getenv("PREFETCH_MIN_SCORE", "2")),
+            half_life=float(os.getenv("PREFETCH_HALF_LIFE_SECONDS", "3600")),
+        )
+    return prefetcher
+
+
+# Per-feed sets of videos already returned, for ?feed_key= callers.
+seen_store = None
+
+
+def get_seen_store():
+    global seen_store
+    if seen_store is None:
+        seen_store = open_seen_store(
+            os.getenv("SEEN_STORE_PATH", "/tmp/reelearners/seen.sqlite3"),
+            max_per_feed=int(os.getenv("SEEN_MAX_PER_FEED", "5000")),
+        )
+    return seen_store
+
+
+def get_result_cache():
+    global result_cache
+    if result_cache is None:
+        result_cache = ResultCache(
+            ttls={
+                "youtube": float(os.getenv("RESULT_CACHE_TTL_YOUTUBE", "21600")),
+                "tiktok": float(os.getenv("RESULT_CACHE_TTL_TIKTOK", "1800")),
+                "instagram": float(os.getenv("RESULT_CACHE_TTL_INSTAGRAM", "900")),
+            },
+            stale_ttl=float(os.getenv("RESULT_CACHE_STALE_SECONDS", "3600")),
+            memory_size=int(os.getenv("RESULT_CACHE_MEMORY_SIZE", "1024")),
+            path=os.getenv(
+                "RESULT_CACHE_PATH", "/tmp/reelearners/search-cache.sqlite3"
+            ),
+        )
+    return result_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global source_executor, http_pool
+    get_source_executor()
+    get_http_pool()
+    # Opening the SQLite files is file I/O; keep it off the event loop. The
+    # shared objects exist before the warm-up thread can reach for them, so
+    # their getters never race it.
+    await asyncio.to_thread(get_result_cache)
+    await asyncio.to_thread(get_hashtag_index)
+    await asyncio.to_thread(get_seen_store)
+    get_prefetcher()
+    _start_warmup()
+    if PREFETCH_SOURCES:
+        prefetcher.start()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if prefetcher is not None:
+        await prefetcher.stop()
+    if source_executor is not None:
+        source_executor.shutdown()
+        source_executor = None
+    if http_pool is not None:
+        http_pool.close()
+        http_pool = None
+    if youtube_searcher is not None:
+        youtube_searcher.close()
+
+
 # Initialize FastAPI app FIRST (before YouTube initialization)
 app = FastAPI(
     title="ReeLearners Video API",
     description="API to serve embedded video links for iframe playback",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """
+    Collect the stage timings of each request into a Server-Timing header
+    and the request latency histogram, and tag its log records.
+    """
+    log_tokens = begin_request()
+    collector, token = start_collecting()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_collecting(token)
+        end_request(log_tokens)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(elapsed, route=getattr(route, "path", "unmatched"))
+    timings = collector.server_timing()
+    total = f"total;dur={elapsed * 1000:.1f}"
+    response.headers["Server-Timing"] = f"{timings}, {total}" if timings else total
+    return response
+
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,18 +244,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upper bound on how long a /search request waits for its sources. Sources that
+# have not answered by then are dropped from the response and reported back.
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "25"))
+
+# Extra continuation pages /search may fetch when the seen filter leaves it
+# short of max_results.
+SEEN_MAX_EXTRA_ROUNDS = int(os.getenv("SEEN_MAX_EXTRA_ROUNDS", "2"))
+
 # Initialize Searchers lazily (only when needed)
 youtube_searcher = None
 tiktok_searcher = None
 instagram_searcher = None
 
+# The lifespan warm-up builds the searchers in worker threads while requests
+# may already be calling the getters, so each getter runs under its own lock.
+searcher_locks = {
+    "youtube": threading.Lock(),
+    "tiktok": threading.Lock(),
+    "instagram": threading.Lock(),
+}
 
+
+def _locked_getter(name: str):
+    def decorate(getter):
+        @functools.wraps(getter)
+        def locked():
+            with searcher_locks[name]:
+                return getter()
+
+        return locked
+
+    return decorate
+
+
+@_locked_getter("youtube")
 def get_youtube_searcher():
     """Lazy initialization of YouTube Searcher with Gemini support"""
     global youtube_searcher
     if youtube_searcher is None:
         try:
             from realVideos import YouTubeShortsSearcher
+            from searchCache import TTLCache
+            from youtubeQuota import QuotaLedger
 
             youtube_api_key = os.getenv("YOUTUBE_API_KEY")
             gemini_api_key = os.getenv("GEMINI_API_KEY")  # Get Gemini key
@@ -56,7 +294,30 @@ def get_youtube_searcher():
             if youtube_api_key:
                 # Initialize with both keys (Gemini is optional)
                 youtube_searcher = YouTubeShortsSearcher(
-                    youtube_api_key, gemini_api_key
+                    youtube_api_key,
+                    gemini_api_key,
+                    topic_concurrency=int(
+                        os.getenv("YOUTUBE_TOPIC_CONCURRENCY", "8")
+                    ),
+                    topic_cache=TTLCache(
+                        maxsize=int(os.getenv("TOPIC_CACHE_SIZE", "512")),
+                        ttl=float(os.getenv("TOPIC_CACHE_TTL_SECONDS", "21600")),
+                    ),
+                    default_expander=os.getenv("QUERY_EXPANDER", "gemini"),
+                    quota=QuotaLedger(
+                        daily_limit=int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000")),
+                        path=os.getenv(
+                            "YOUTUBE_QUOTA_PATH",
+                            "/tmp/reelearners/youtube-quota.sqlite3",
+                        ),
+                        low_quota_fraction=float(
+                            os.getenv("YOUTUBE_LOW_QUOTA_FRACTION", "0.1")
+                        ),
+                    ),
+                    request_quota_budget=int(
+                        os.getenv("YOUTUBE_REQUEST_QUOTA_BUDGET", "502")
+                    ),
+                    max_fill_rounds=int(os.getenv("YOUTUBE_MAX_FILL_ROUNDS", "1")),
                 )
 
                 if gemini_api_key:
@@ -73,6 +334,7 @@ def get_youtube_searcher():
 
 
 # TikTok searcher initialization
+@_locked_getter("tiktok")
 def get_tiktok_searcher():
     global tiktok_searcher
     if tiktok_searcher is None:
@@ -83,7 +345,19 @@ def get_tiktok_searcher():
             actor_id = os.getenv("APIFY_TIKTOK_ACTOR_ID", "clockworks/tiktok-scraper")
 
             if apify_token:
-                tiktok_searcher = TikTokVideoSearcher(apify_token, actor_id=actor_id)
+                tiktok_searcher = TikTokVideoSearcher(
+                    apify_token,
+                    actor_id=actor_id,
+                    run_mode=os.getenv("TIKTOK_RUN_MODE", "async"),
+                    run_timeout_seconds=float(
+                        os.getenv("TIKTOK_RUN_TIMEOUT_SECONDS", "60")
+                    ),
+                    poll_interval=float(os.getenv("TIKTOK_POLL_INTERVAL_SECONDS", "2")),
+                    batch_window_seconds=float(
+                        os.getenv("TIKTOK_BATCH_WINDOW_SECONDS", "0.25")
+                    ),
+                    batch_max_hashtags=int(os.getenv("TIKTOK_BATCH_MAX_HASHTAGS", "20")),
+                )
                 logger.info("TikTok Searcher initialized (Apify)")
             else:
                 logger.warning("APIFY_TOKEN not set")
@@ -93,6 +367,7 @@ def get_tiktok_searcher():
 
 
 # Instagram searcher initialization
+@_locked_getter("instagram")
 def get_instagram_searcher():
     global instagram_searcher
     if instagram_searcher is None:
@@ -107,7 +382,15 @@ def get_instagram_searcher():
 
             if access_token and user_id:
                 instagram_searcher = InstagramReelsSearcher(
-                    access_token, user_id, base_url=base_url
+                    access_token,
+                    user_id,
+                    base_url=base_url,
+                    session=get_http_pool().session,
+                    hashtag_index=get_hashtag_index(),
+                    max_hashtags=int(os.getenv("INSTAGRAM_MAX_HASHTAGS", "3")),
+                    page_deadline_seconds=float(
+                        os.getenv("INSTAGRAM_PAGE_DEADLINE_SECONDS", "15")
+                    ),
                 )
                 logger.info("Instagram Reels Searcher initialized")
             else:
@@ -117,6 +400,61 @@ def get_instagram_searcher():
     return instagram_searcher
 
 
+# Build the searchers in the background as soon as the process starts, so the
+# first request after a scale-up does not pay for the client imports and the
+# discovery build(). /health reports 503 until this has finished.
+SEARCHER_WARMUP = os.getenv("SEARCHER_WARMUP", "true").lower() in ("1", "true", "yes")
+warmup_task: Optional[asyncio.Task] = None
+warmup_status: Dict[str, Any] = {"state": "pending"}
+
+
+async def _warm_up_searchers():
+    getters = {
+        "youtube": get_youtube_searcher,
+        "tiktok": get_tiktok_searcher,
+        "instagram": get_instagram_searcher,
+    }
+    started = time.perf_counter()
+    try:
+        searchers = await asyncio.gather(
+            *(asyncio.to_thread(getter) for getter in getters.values())
+        )
+        warmup_status["searchers"] = {
+            name: searcher is not None for name, searcher in zip(getters, searchers)
+        }
+    except Exception as e:
+        # The getters stay lazy, so requests can still build what failed here.
+        logger.error(f"Searcher warm-up failed: {e}")
+    elapsed = time.perf_counter() - started
+    warmup_status.update(state="ready", elapsed_ms=round(elapsed * 1000, 1))
+    logger.info(
+        "Searcher warm-up finished in %.0f ms: %s",
+        elapsed * 1000,
+        warmup_status.get("searchers"),
+    )
+
+
+def _start_warmup():
+    global warmup_task
+    if not SEARCHER_WARMUP:
+        warmup_status["state"] = "ready"
+        return
+    warmup_status.clear()
+    warmup_status["state"] = "warming"
+    warmup_task = asyncio.create_task(_warm_up_searchers())
+
+
+async def _searchers_ready():
+    """
+    Wait for the startup warm-up, if it is still running.
+
+    Handlers call this before touching a searcher getter, so they never
+    block the event loop on a getter lock held by the warm-up thread.
+    """
+    if warmup_task is not None and not warmup_task.done():
+        await asyncio.shield(warmup_task)
+
+
 # Pydantic models for request/response
 class VideoResponse(BaseModel):
     video_id: str
@@ -132,6 +470,10 @@ class VideoListResponse(BaseModel):
     count: int
     query: str
     optimized_query: Optional[str] = None  # Show what Gemini optimized it to
+    timed_out_sources: List[str] = Field(default_factory=list)
+    failed_sources: List[str] = Field(default_factory=list)  # Upstream errors
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+    seen_filtered: int = 0  # Videos dropped because they were already seen
 
 
 class EmbedLinkResponse(BaseModel):
@@ -150,6 +492,388 @@ class BatchEmbedResponse(BaseModel):
     count: int
 
 
+def _search_response(
+    http_request: Request,
+    query: str,
+    videos: List[VideoRecord],
+    timed_out_sources: List[str],
+    failed_sources: List[str],
+    next_cursor: Optional[str],
+    seen_filtered: int,
+):
+    """Encode a VideoListResponse body directly, without model validation."""
+    return json_response(
+        {
+            "videos": [video.to_dict() for video in videos],
+            "count": len(videos),
+            "query": query,
+            "optimized_query": None,
+            "timed_out_sources": timed_out_sources,
+            "failed_sources": failed_sources,
+            "next_cursor": next_cursor,
+            "seen_filtered": seen_filtered,
+        },
+        http_request.headers.get("accept-encoding"),
+    )
+
+
+# Searchers return (videos, state for the next page or None when exhausted).
+PageCall = Callable[[], Tuple[List[VideoRecord], Optional[Dict]]]
+
+
+def _encode_cursor(query: str, states: Dict[str, Dict]) -> str:
+    """Pack per-source page states into an opaque, URL-safe cursor."""
+    payload = {
+        "v": 1,
+        "q": hashlib.sha1(normalize_query(query).encode()).hexdigest()[:10],
+        "s": states,
+    }
+    raw = zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, query: str) -> Dict[str, Dict]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(zlib.decompress(raw))
+    except (binascii.Error, zlib.error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    query_digest = hashlib.sha1(normalize_query(query).encode()).hexdigest()[:10]
+    if (
+        not isinstance(payload, dict)
+        or payload.get("v") != 1
+        or payload.get("q") != query_digest
+        or not isinstance(payload.get("s"), dict)
+    ):
+        raise HTTPException(
+            status_code=400, detail="Cursor does not belong to this query"
+        )
+    return payload["s"]
+
+
+def _state_digest(state: Optional[Dict]) -> str:
+    if not state:
+        return ""
+    encoded = json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+async def _fetch_and_cache(
+    source: str, cache_key: str, call: PageCall
+) -> Dict[str, Any]:
+    def fetch():
+        with stage(f"{source}_fetch", source):
+            videos, next_state = call()
+        page = {"videos": videos, "next": next_state}
+        # Stored from the worker thread, so a search that misses the request
+        # deadline still warms the cache for the next refill.
+        if videos:
+            get_result_cache().set(source, cache_key, page)
+        return page
+
+    page = await search_flights.do(
+        cache_key, lambda: get_source_executor().run(source, fetch)
+    )
+    if source in PREFETCH_SOURCES:
+        get_prefetcher().mark_fetched(cache_key)
+    return page
+
+
+async def _prefetch(payload: Tuple[str, str, PageCall]):
+    source, cache_key, call = payload
+    await _fetch_and_cache(source, cache_key, call)
+
+
+def _refresh_in_background(source: str, cache_key: str, call: PageCall):
+    if search_flights.in_flight(cache_key):
+        return
+
+    async def refresh():
+        try:
+            await _fetch_and_cache(source, cache_key, call)
+        except Exception as e:
+            logger.warning("Background refresh for %s failed: %s", source, e)
+
+    task = asyncio.create_task(refresh())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+async def _cached_search(
+    source: str, cache_key: str, call: PageCall
+) -> Dict[str, Any]:
+    """
+    Serve a page of source results from the result cache when possible.
+
+    Stale entries are returned immediately while a background refresh
+    replaces them (stale-while-revalidate). Misses join any identical search
+    that is already in flight.
+    """
+    cached = await get_result_cache().get_async(source, cache_key)
+    if cached is not None:
+        if not cached.fresh:
+            _refresh_in_background(source, cache_key, call)
+        logger.info(
+            "%s served from cache (age %.0fs, fresh=%s)",
+            source,
+            cached.age,
+            cached.fresh,
+        )
+        page = cached.value
+    else:
+        page = await _fetch_and_cache(source, cache_key, call)
+    # The disk tier hands back field lists (or dicts from older entries).
+    videos = [VideoRecord.from_cached(video) for video in page["videos"]]
+    return {"videos": videos, "next": page["next"]}
+
+
+async def _run_sources(
+    searches: Dict[str, Awaitable[Dict[str, Any]]], timeout: float
+) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str]]:
+    """
+    Run the per-source searches concurrently under a shared deadline.
+
+    Args:
+        searches: Mapping of source name to the awaitable producing its page
+        timeout: Seconds to wait for all sources before giving up on stragglers
+
+    Returns:
+        Tuple of (results keyed by source, names of sources that timed out,
+        names of sources that failed)
+    """
+    tasks = {
+        name: asyncio.create_task(search) for name, search in searches.items()
+    }
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+
+    # The worker threads cannot be interrupted; cancelling only detaches them
+    # so the response does not wait for them. They keep their executor slot
+    # until they finish.
+    timed_out = []
+    for name, task in tasks.items():
+        if task in pending:
+            task.cancel()
+            timed_out.append(name)
+            logger.warning("Source '%s' missed the %.1fs deadline", name, timeout)
+
+    # A failing source is dropped from the response rather than failing it.
+    results = {}
+    failed = []
+    for name, task in tasks.items():
+        if task in pending:
+            continue
+        try:
+            results[name] = task.result()
+        except Exception as e:
+            failed.append(name)
+            logger.error("Search for %s failed: %s", name, e)
+    return results, timed_out, failed
+
+
+def _split_limit(total: int, sources: List[str]) -> Dict[str, int]:
+    """
+    Share total results between sources so the shares add up to it exactly.
+
+    A source that asked for more than the page keeps would have its cursor
+    advanced past the videos cut off the end, so no source is asked for
+    more than its share; sources left with a share of 0 sit the round out.
+    """
+    base, extra = divmod(total, max(1, len(sources)))
+    limits = {
+        source: base + (1 if index < extra else 0)
+        for index, source in enumerate(sources)
+    }
+    return {source: limit for source, limit in limits.items() if limit}
+
+
+def _build_source_calls(
+    query: str,
+    source_limits: Dict[str, int],
+    optimize: bool,
+    expander: Optional[str],
+    page_states: Optional[Dict[str, Dict]],
+    quota_budget: Optional[int] = None,
+) -> Dict[str, Tuple[str, PageCall]]:
+    """
+    Resolve the searchers for one round and bind their page calls.
+
+    Args:
+        source_limits: Results to ask each source for, by source name
+
+    Returns:
+        Mapping of source name to (result cache key, page call)
+    """
+    cache = get_result_cache()
+    source_calls: Dict[str, Tuple[str, PageCall]] = {}
+
+    def state_for(source: str) -> Optional[Dict]:
+        return (page_states or {}).get(source) or None
+
+    if "youtube" in source_limits:
+        searcher = get_youtube_searcher()
+        if not searcher:
+            raise HTTPException(
+                status_code=503,
+                detail=(
+                    "YouTube API not configured. Please set YOUTUBE_API_KEY "
+                    "environment variable."
+                ),
+            )
+        source_calls["youtube"] = (
+            cache.key(
+                "youtube",
+                query,
+                source_limits["youtube"],
+                f"optimize={optimize};expander={expander or ''};"
+                f"budget={'' if quota_budget is None else quota_budget};"
+                f"page={_state_digest(state_for('youtube'))}",
+            ),
+            functools.partial(
+                searcher.search_shorts_page,
+                query,
+                source_limits["youtube"],
+                optimize_prompt=optimize,
+                expander=expander,
+                page_state=state_for("youtube"),
+                quota_budget=quota_budget,
+            ),
+        )
+
+    if "tiktok" in source_limits:
+        searcher = get_tiktok_searcher()
+        if not searcher:
+            raise HTTPException(
+                status_code=503,
+                detail=(
+                    "TikTok scraper not configured. Please set APIFY_TOKEN "
+                    "environment variable."
+                ),
+            )
+        source_calls["tiktok"] = (
+            cache.key(
+                "tiktok",
+                query,
+                source_limits["tiktok"],
+                f"page={_state_digest(state_for('tiktok'))}",
+            ),
+            functools.partial(
+                searcher.search_videos_page,
+                query,
+                source_limits["tiktok"],
+                page_state=state_for("tiktok"),
+            ),
+        )
+
+    if "instagram" in source_limits:
+        searcher = get_instagram_searcher()
+        if not searcher:
+            raise HTTPException(
+                status_code=503,
+                detail=(
+                    "Instagram API not configured. Please set INSTAGRAM_ACCESS_TOKEN "
+                    "and INSTAGRAM_USER_ID environment variables."
+                ),
+            )
+        source_calls["instagram"] = (
+            cache.key(
+                "instagram",
+                query,
+                source_limits["instagram"],
+                f"page={_state_digest(state_for('instagram'))}",
+            ),
+            functools.partial(
+                searcher.search_reels_page,
+                query,
+                source_limits["instagram"],
+                page_state=state_for("instagram"),
+            ),
+        )
+
+    for source, (cache_key, call) in source_calls.items():
+        if source in PREFETCH_SOURCES and not state_for(source):
+            get_prefetcher().record(
+                cache_key,
+                (source, cache_key, call),
+                refresh_after=cache.ttl_for(source) * PREFETCH_REFRESH_FRACTION,
+            )
+
+    return source_calls
+
+
+def _parse_search_request(
+    query: str,
+    max_results: int,
+    sources: Optional[str],
+    expander: Optional[str],
+    cursor: Optional[str],
+    quota_budget: Optional[int] = None,
+) -> Tuple[List[str], Optional[Dict[str, Dict]], List[str]]:
+    """
+    Validate the shared /search parameters.
+
+    Returns:
+        Tuple of (requested sources, page states from the cursor or None for
+        the first page, sources to query this time)
+    """
+    requested_sources = [
+        item.strip().lower()
+        for item in (sources.split(",") if sources else ["youtube", "tiktok"])
+        if item.strip()
+    ]
+    if not requested_sources:
+        requested_sources = ["youtube", "tiktok"]
+
+    if not query or len(query.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Query parameter is required")
+
+    if max_results < 1 or max_results > 50:
+        raise HTTPException(
+            status_code=400, detail="max_results must be between 1 and 50"
+        )
+
+    if quota_budget is not None and quota_budget < 0:
+        raise HTTPException(status_code=400, detail="quota_budget cannot be negative")
+
+    if expander is not None and expander not in ("gemini", "local", "none"):
+        raise HTTPException(
+            status_code=400, detail="expander must be one of gemini, local, none"
+        )
+
+    # None means first page; otherwise only sources with a saved state continue.
+    page_states = _decode_cursor(cursor, query) if cursor else None
+    active_sources = [
+        source
+        for source, aliases in (
+            ("youtube", ("youtube",)),
+            ("tiktok", ("tiktok",)),
+            ("instagram", ("instagram", "reels")),
+        )
+        if any(alias in requested_sources for alias in aliases)
+        and (page_states is None or source in page_states)
+    ]
+    return requested_sources, page_states, active_sources
+
+
+async def _load_seen(seen: Optional[str], feed_key: Optional[str]):
+    """
+    Combine the client-sent seen set with the server-kept one for feed_key.
+
+    Returns:
+        Tuple of (seen digests, SeenStore to record returned videos in or None)
+    """
+    seen_digests: Set[int] = set()
+    if seen:
+        try:
+            seen_digests = decode_seen(seen)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    store = get_seen_store() if feed_key else None
+    if store is not None:
+        seen_digests |= await asyncio.to_thread(store.get, feed_key)
+    return seen_digests, store
+
+
 # Routes
 
 
@@ -167,17 +891,138 @@ async def root():
 
 @app.get("/health", tags=["Health"])
 async def health():
-    """Health check endpoint for Cloud Run"""
+    """
+    Health check endpoint for Cloud Run.
+
+    Answers 503 while the searchers are still warming up, so traffic is only
+    routed here once the first search will not pay for their startup.
+    """
     logger.info("Health check endpoint called")
-    return {"status": "healthy"}
+    if warmup_status["state"] != "ready":
+        return JSONResponse(status_code=503, content={"status": "warming"})
+    return {"status": "healthy", "warmup": warmup_status}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Metrics"])
+async def metrics():
+    """Prometheus text exposition of latencies, cache hit rates and errors"""
+    lines = STAGE_SECONDS.render() + STAGE_ERRORS.render() + REQUEST_SECONDS.render()
+
+    cache_samples = [
+        ({"source": source, "result": result}, count)
+        for source, counts in get_result_cache().stats()["sources"].items()
+        for result, count in counts.items()
+    ]
+    lines += render_samples(
+        "reelearners_result_cache_lookups_total",
+        "counter",
+        "Result cache lookups by source and outcome.",
+        cache_samples,
+    )
+
+    flights = search_flights.stats()
+    lines += render_samples(
+        "reelearners_search_flights_total",
+        "counter",
+        "Upstream searches started versus joined while already in flight.",
+        [
+            ({"outcome": "started"}, flights["started"]),
+            ({"outcome": "coalesced"}, flights["coalesced"]),
+        ],
+    )
+
+    if youtube_searcher is not None:
+        topics = youtube_searcher.topic_cache.stats()
+        lines += render_samples(
+            "reelearners_topic_cache_lookups_total",
+            "counter",
+            "Gemini topic cache lookups by outcome.",
+            [
+                ({"result": "hit"}, topics["hits"]),
+                ({"result": "miss"}, topics["misses"]),
+            ],
+        )
+        quota = await asyncio.to_thread(youtube_searcher.quota.stats)
+        lines += render_samples(
+            "reelearners_youtube_quota_units",
+            "gauge",
+            "YouTube Data API units for the current quota day.",
+            [
+                ({"state": "spent"}, quota["spent"]),
+                ({"state": "remaining"}, quota["remaining"]),
+            ],
+        )
+
+    if http_pool is not None:
+        pool = http_pool.stats()
+        lines += render_samples(
+            "reelearners_http_pool_total",
+            "counter",
+            "Requests sent and connections opened by the shared REST session.",
+            [
+                ({"kind": "requests"}, pool["requests"]),
+                ({"kind": "connections"}, pool["connections_opened"]),
+            ],
+        )
+
+    return PlainTextResponse(
+        "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/metrics/http-pool", tags=["Metrics"])
+async def http_pool_metrics():
+    """Connection reuse counters for the shared REST session"""
+    return get_http_pool().stats()
+
+
+@app.get("/metrics/youtube-quota", tags=["Metrics"])
+async def youtube_quota_metrics():
+    """YouTube Data API units spent today, per call type"""
+    await _searchers_ready()
+    searcher = get_youtube_searcher()
+    if searcher is None:
+        raise HTTPException(status_code=503, detail="YouTube API not configured")
+    return await asyncio.to_thread(searcher.quota.stats)
+
+
+@app.get("/metrics/prefetch", tags=["Metrics"])
+async def prefetch_metrics():
+    """Popular searches tracked and kept warm by the prefetch scheduler"""
+    return get_prefetcher().stats()
+
+
+@app.get("/metrics/tiktok-batches", tags=["Metrics"])
+async def tiktok_batch_metrics():
+    """Actor runs started versus TikTok searches they served"""
+    await _searchers_ready()
+    searcher = get_tiktok_searcher()
+    if searcher is None or searcher.batcher is None:
+        raise HTTPException(status_code=503, detail="TikTok run batching is disabled")
+    return searcher.batcher.stats()
+
+
+@app.get("/metrics/instagram-hashtags", tags=["Metrics"])
+async def instagram_hashtag_metrics():
+    """Hashtag index hit counts and the rolling lookup budget"""
+    index = await asyncio.to_thread(get_hashtag_index)
+    if index is None:
+        raise HTTPException(status_code=503, detail="Hashtag index is disabled")
+    return await asyncio.to_thread(index.stats)
 
 
 @app.get("/search", response_model=VideoListResponse, tags=["Search"])
 async def search_videos(
+    http_request: Request,
     query: str,
     max_results: int = 50,
     optimize: bool = True,  # New parameter to control Gemini optimization
     sources: Optional[str] = None,
+    expander: Optional[str] = None,
+    cursor: Optional[str] = None,
+    seen: Optional[str] = None,
+    feed_key: Optional[str] = None,
+    quota_budget: Optional[int] = None,
 ):
     """
     Search for YouTube Shorts based on a query.
@@ -188,117 +1033,334 @@ async def search_videos(
                 or just "Python tutorial")
         max_results: Maximum number of results (1-50, default: 10)
         optimize: Whether to use Gemini to optimize the query (default: True)
+        expander: How to expand the query into topics: "gemini", "local"
+                  (in-process, no LLM call) or "none" (default: QUERY_EXPANDER)
+        cursor: next_cursor from a previous response; fetches only the next
+                page of each source that still has more results
+        seen: Compact set of video IDs to leave out (see seenSet.encode_seen)
+        feed_key: Key of a server-kept seen set; returned videos are added to it
+        quota_budget: YouTube quota units this search may spend; can only lower
+                      YOUTUBE_REQUEST_QUOTA_BUDGET
 
     Returns:
         List of videos with embedded links
     """
 
-    requested_sources = [
-        item.strip().lower()
-        for item in (sources.split(",") if sources else ["youtube", "tiktok"])
-        if item.strip()
-    ]
-    if not requested_sources:
-        requested_sources = ["youtube", "tiktok"]
-
-    if not query or len(query.strip()) == 0:
-        raise HTTPException(status_code=400, detail="Query parameter is required")
-
-    if max_results < 1 or max_results > 50:
-        raise HTTPException(
-            status_code=400, detail="max_results must be between 1 and 50"
-        )
+    requested_sources, page_states, active_sources = _parse_search_request(
+        query, max_results, sources, expander, cursor, quota_budget
+    )
+    seen_digests, store = await _load_seen(seen, feed_key)
 
     try:
         logger.info(
-            f"Searching for: {query} (sources={requested_sources}, optimize={optimize})"
+            "Searching for: %s (sources=%s, optimize=%s)",
+            query,
+            requested_sources,
+            optimize,
         )
         logger.info("Resolved sources list: %s", requested_sources)
 
-        per_source_limit = max(1, max_results // max(1, len(requested_sources)))
+        await _searchers_ready()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SEARCH_DEADLINE_SECONDS
+
         videos = []
+        returned_ids: Set[str] = set()
+        seen_filtered = 0
+        timed_out_sources: List[str] = []
+        failed_sources: List[str] = []
+        cursor_states: Dict[str, Dict] = dict(page_states or {})
+        round_sources = active_sources
+        round_states = page_states
+        # With a seen set, keep following the continuation until enough
+        # unseen videos turn up, within the request deadline.
+        max_rounds = 1 + (SEEN_MAX_EXTRA_ROUNDS if seen_digests else 0)
+
+        for round_index in range(max_rounds):
+            # Later rounds only ask for what is still missing, so the page
+            # never holds more than max_results and nothing fetched is dropped.
+            source_calls = _build_source_calls(
+                query,
+                _split_limit(max_results - len(videos), round_sources),
+                optimize,
+                expander,
+                round_states,
+                quota_budget,
+            )
+            searches = {
+                source: _cached_search(source, cache_key, call)
+                for source, (cache_key, call) in source_calls.items()
+            }
+            source_results, round_timed_out, round_failed = await _run_sources(
+                searches, max(0.0, deadline - loop.time())
+            )
 
-        if "youtube" in requested_sources:
-            searcher = get_youtube_searcher()
-            if not searcher:
-                raise HTTPException(
-                    status_code=503,
-                    detail=(
-                        "YouTube API not configured. Please set YOUTUBE_API_KEY "
-                        "environment variable."
-                    ),
-                )
-            youtube_results = searcher.search_shorts(
-                query, per_source_limit, optimize_prompt=optimize
+            for source in source_calls:
+                if source in round_timed_out:
+                    # Retry the same page next time instead of skipping past it.
+                    cursor_states[source] = (round_states or {}).get(source) or {}
+                    if source not in timed_out_sources:
+                        timed_out_sources.append(source)
+                    continue
+                if source in round_failed:
+                    cursor_states.pop(source, None)
+                    if source not in failed_sources:
+                        failed_sources.append(source)
+                    continue
+                page = source_results[source]
+                results = page["videos"]
+                logger.info("%s results fetched: %s", source, len(results))
+                if not results:
+                    logger.warning(
+                        "%s search returned 0 results for '%s'", source, query
+                    )
+                for video in results:
+                    video_id = video.video_id
+                    if video_id in returned_ids:
+                        continue
+                    if seen_digests and video_digest(video_id) in seen_digests:
+                        seen_filtered += 1
+                        continue
+                    returned_ids.add(video_id)
+                    videos.append(video)
+                if page["next"] is not None:
+                    cursor_states[source] = page["next"]
+                else:
+                    cursor_states.pop(source, None)
+
+            round_sources = [
+                source
+                for source in source_calls
+                if source in cursor_states
+                and source not in round_timed_out
+                and source not in round_failed
+            ]
+            if (
+                len(videos) >= max_results
+                or not round_sources
+                or round_index + 1 == max_rounds
+                or deadline - loop.time() <= 0
+            ):
+                break
+            round_states = cursor_states
+            logger.info(
+                "Only %s unseen videos so far, fetching next page of %s",
+                len(videos),
+                round_sources,
             )
-            logger.info("YouTube results fetched: %s", len(youtube_results))
-            if not youtube_results:
-                logger.warning("YouTube search returned 0 results for '%s'", query)
-            videos.extend(youtube_results)
-
-        if "tiktok" in requested_sources:
-            searcher = get_tiktok_searcher()
-            if not searcher:
-                raise HTTPException(
-                    status_code=503,
-                    detail=(
-                        "TikTok scraper not configured. Please set APIFY_TOKEN "
-                        "environment variable."
-                    ),
-                )
-            tiktok_results = searcher.search_videos(query, per_source_limit)
-            logger.info("TikTok results fetched: %s", len(tiktok_results))
-            if not tiktok_results:
-                logger.warning("TikTok search returned 0 results for '%s'", query)
-            videos.extend(tiktok_results)
-
-        if "instagram" in requested_sources or "reels" in requested_sources:
-            searcher = get_instagram_searcher()
-            if not searcher:
-                raise HTTPException(
-                    status_code=503,
-                    detail=(
-                        "Instagram API not configured. Please set INSTAGRAM_ACCESS_TOKEN "
-                        "and INSTAGRAM_USER_ID environment variables."
-                    ),
-                )
-            videos.extend(searcher.search_reels(query, per_source_limit))
+
+        next_cursor = (
+            _encode_cursor(query, cursor_states) if cursor_states else None
+        )
 
         if not videos:
-            return VideoListResponse(
-                videos=[], count=0, query=query, optimized_query=None
+            return _search_response(
+                http_request,
+                query,
+                [],
+                timed_out_sources,
+                failed_sources,
+                next_cursor,
+                seen_filtered,
             )
 
         # Preserve source priority when multiple sources are requested.
         if len(requested_sources) > 1:
             priority = {source: idx for idx, source in enumerate(requested_sources)}
-            videos.sort(key=lambda item: priority.get(item.get("source", ""), 999))
+            videos.sort(key=lambda item: priority.get(item.source, 999))
         else:
             import random
 
             random.shuffle(videos)
-        videos = videos[:max_results]
 
-        if not videos:
-            return VideoListResponse(
-                videos=[], count=0, query=query, optimized_query=None
+        if store is not None:
+            await asyncio.to_thread(
+                store.add, feed_key, [video_digest(video.video_id) for video in videos]
             )
 
         # Note: We don't have direct access to the optimized query from search_shorts
         # If you want to return it, you'd need to modify YouTubeShortsSearcher.search_shorts
         # to return both videos and the optimized query
 
-        return VideoListResponse(
-            videos=[VideoResponse(**video) for video in videos],
-            count=len(videos),
-            query=query,
-            optimized_query=None,  # Could be enhanced to show actual optimized query
+        # Records are already normalized by the searchers, so they are encoded
+        # straight to bytes; response_model only documents the shape.
+        return _search_response(
+            http_request,
+            query,
+            videos,
+            timed_out_sources,
+            failed_sources,
+            next_cursor,
+            seen_filtered,
         )
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@app.get(
+    "/search/stream",
+    tags=["Search"],
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Newline-delimited JSON: video frames, then a summary frame",
+            "content": {"application/x-ndjson": {}},
+        }
+    },
+)
+async def stream_search_videos(
+    query: str,
+    max_results: int = 50,
+    optimize: bool = True,
+    sources: Optional[str] = None,
+    expander: Optional[str] = None,
+    cursor: Optional[str] = None,
+    seen: Optional[str] = None,
+    feed_key: Optional[str] = None,
+    quota_budget: Optional[int] = None,
+):
+    """
+    Streaming variant of /search that answers with newline-delimited JSON.
+
+    Takes the same parameters as /search. Each source's videos are flushed
+    as {"type": "video", "video": {...}} lines as soon as that source
+    answers, so playback can start before the slowest scraper finishes. The
+    last line is {"type": "summary", ...} with per-source counts and
+    timings, the sources that missed the deadline and next_cursor.
+    """
+    _, page_states, active_sources = _parse_search_request(
+        query, max_results, sources, expander, cursor, quota_budget
+    )
+    seen_digests, store = await _load_seen(seen, feed_key)
+    # Resolved before the response starts so configuration errors are still
+    # plain HTTP errors.
+    await _searchers_ready()
+    source_calls = _build_source_calls(
+        query,
+        _split_limit(max_results, active_sources),
+        optimize,
+        expander,
+        page_states,
+        quota_budget,
+    )
+
+    async def frames():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + SEARCH_DEADLINE_SECONDS
+        tasks = {
+            asyncio.create_task(_cached_search(source, cache_key, call)): source
+            for source, (cache_key, call) in source_calls.items()
+        }
+        source_summaries: Dict[str, Dict[str, Any]] = {}
+        cursor_states: Dict[str, Dict] = dict(page_states or {})
+        returned_ids: Set[str] = set()
+        returned_digests: List[int] = []
+        seen_filtered = 0
+
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    source = tasks[task]
+                    elapsed_ms = round((loop.time() - started) * 1000, 1)
+                    try:
+                        page = task.result()
+                    except Exception as e:
+                        logger.error("Streaming search for %s failed: %s", source, e)
+                        cursor_states.pop(source, None)
+                        source_summaries[source] = {
+                            "status": "error",
+                            "count": 0,
+                            "elapsed_ms": elapsed_ms,
+                        }
+                        continue
+
+                    lines = []
+                    for video in page["videos"]:
+                        video_id = video.video_id
+                        if video_id in returned_ids:
+                            continue
+                        digest = video_digest(video_id)
+                        if digest in seen_digests:
+                            seen_filtered += 1
+                            continue
+                        returned_ids.add(video_id)
+                        returned_digests.append(digest)
+                        frame = {
+                            "type": "video",
+                            "video": video.to_dict(),
+                        }
+                        lines.append(dumps(frame).decode())
+
+                    if page["next"] is not None:
+                        cursor_states[source] = page["next"]
+                    else:
+                        cursor_states.pop(source, None)
+                    source_summaries[source] = {
+                        "status": "ok",
+                        "count": len(lines),
+                        "elapsed_ms": elapsed_ms,
+                    }
+                    if lines:
+                        yield ("\n".join(lines) + "\n").encode()
+
+            timed_out_sources = []
+            for task in pending:
+                source = tasks[task]
+                task.cancel()
+                timed_out_sources.append(source)
+                # Retry the same page next time instead of skipping past it.
+                cursor_states[source] = (page_states or {}).get(source) or {}
+                source_summaries[source] = {
+                    "status": "timeout",
+                    "count": 0,
+                    "elapsed_ms": round((loop.time() - started) * 1000, 1),
+                }
+                logger.warning(
+                    "Source '%s' missed the %.1fs deadline",
+                    source,
+                    SEARCH_DEADLINE_SECONDS,
+                )
+
+            if store is not None and returned_digests:
+                await asyncio.to_thread(store.add, feed_key, returned_digests)
+
+            summary = {
+                "type": "summary",
+                "count": len(returned_ids),
+                "query": query,
+                "sources": source_summaries,
+                "timed_out_sources": timed_out_sources,
+                "failed_sources": [
+                    source
+                    for source, entry in source_summaries.items()
+                    if entry["status"] == "error"
+                ],
+                "seen_filtered": seen_filtered,
+                "next_cursor": (
+                    _encode_cursor(query, cursor_states) if cursor_states else None
+                ),
+                "elapsed_ms": round((loop.time() - started) * 1000, 1),
+            }
+            yield (json.dumps(summary, separators=(",", ":")) + "\n").encode()
+        finally:
+            # Client went away or the deadline passed: detach the stragglers.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
 @app.get("/embed/{video_id}", response_model=EmbedLinkResponse, tags=["Embed"])
 async def get_embed_link(video_id: str):
     """
@@ -341,7 +1403,7 @@ async def get_embed_link(video_id: str):
 
 
 @app.post("/batch-embed", response_model=BatchEmbedResponse, tags=["Embed"])
-async def batch_get_embed_links(request: BatchEmbedRequest):
+async def batch_get_embed_links(request: BatchEmbedRequest, http_request: Request):
     """
     Get embedded links for multiple videos.
 
@@ -359,7 +1421,10 @@ async def batch_get_embed_links(request: BatchEmbedRequest):
         embed_url = f"https://www.youtube.com/embed/{video_id}"
         embeds.append({"video_id": video_id, "embed_url": embed_url})
 
-    return BatchEmbedResponse(embeds=embeds, count=len(embeds))
+    return json_response(
+        {"embeds": embeds, "count": len(embeds)},
+        http_request.headers.get("accept-encoding"),
+    )
 
 
 # Run the server
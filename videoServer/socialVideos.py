@@ -1,62 +1,280 @@
 import datetime
+import hashlib
 import logging
+import itertools
 import re
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
 
 import requests
 from apify_client import ApifyClient
 
+from hashtagIndex import HashtagIndex
+from queryExpansion import STOPWORDS
+from telemetry import in_context, stage
+from videoRecord import VideoRecord
+
 logger = logging.getLogger(__name__)
 
+# The Apify actor has no continuation token, so TikTok page state remembers
+# short digests of the videos already returned (newest last).
+TIKTOK_PAGE_SKIP_LIMIT = 150
+TIKTOK_MAX_DEPTH = 200
+
+# Only the dataset fields the result mapping, _extract_video_url and the run
+# batcher read; scraped items carry far more (author, music, stats, ...).
+TIKTOK_DATASET_FIELDS = [
+    "webVideoUrl",
+    "text",
+    "videoUrl",
+    "videoUrlNoWaterMark",
+    "video_url",
+    "downloadAddr",
+    "videoDownloadAddress",
+    "video",
+    "hashtags",
+    "searchHashtag",
+]
+TIKTOK_DATASET_PAGE_SIZE = 50
+
+APIFY_TERMINAL_STATUSES = frozenset({"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"})
+
+# Largest page recent_media returns.
+INSTAGRAM_PAGE_LIMIT = 50
+
+# Share of the weekly hashtag lookup budget that must be left before a
+# run-together keyword pair (#datascience) is looked up on a guess.
+BIGRAM_LOOKUP_RESERVE = 0.5
+
+
+def _video_digest(video_id: str) -> str:
+    return hashlib.blake2b(video_id.encode(), digest_size=5).hexdigest()
+
+
+def _extract_video_url(item: Dict) -> Optional[str]:
+    candidates: List[Optional[str]] = [
+        item.get("videoUrl"),
+        item.get("videoUrlNoWaterMark"),
+        item.get("video_url"),
+        item.get("downloadAddr"),
+        item.get("videoDownloadAddress"),
+    ]
+
+    video = item.get("video")
+    if isinstance(video, dict):
+        candidates.extend(
+            [
+                video.get("downloadAddr"),
+                video.get("playAddr"),
+                video.get("playAddrH264"),
+                video.get("playAddrBytevc1"),
+            ]
+        )
+
+        for key in ("playAddr", "downloadAddr"):
+            nested = video.get(key)
+            if isinstance(nested, dict):
+                url_list = nested.get("urlList") or nested.get("url_list")
+                if isinstance(url_list, list):
+                    candidates.extend(url_list)
+                direct_url = nested.get("url") or nested.get("uri")
+                if isinstance(direct_url, str):
+                    candidates.append(direct_url)
+
+    for value in candidates:
+        if isinstance(value, list):
+            for entry in value:
+                if isinstance(entry, str) and entry:
+                    return entry
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def _item_hashtags(item: Dict) -> Set[str]:
+    """Hashtags a scraped item was found under or is tagged with."""
+    names: Set[str] = set()
+    search_hashtag = item.get("searchHashtag")
+    if isinstance(search_hashtag, dict) and search_hashtag.get("name"):
+        names.add(str(search_hashtag["name"]).lower())
+    for hashtag in item.get("hashtags") or []:
+        if isinstance(hashtag, dict) and hashtag.get("name"):
+            names.add(str(hashtag["name"]).lower())
+        elif isinstance(hashtag, str):
+            names.add(hashtag.lower())
+    return names
+
+
+class _TikTokRunRequest:
+    def __init__(self, tags: List[str], results_per_page: int):
+        self.tags = {tag.lower() for tag in tags}
+        self.results_per_page = results_per_page
+        self.wanted = results_per_page * len(self.tags)
+        self.items: List[Dict] = []
+        self.future: Future = Future()
+
+
+class _TikTokBatch:
+    def __init__(self):
+        self.requests: List[_TikTokRunRequest] = []
+        self.tags: Set[str] = set()
+        self.full = threading.Event()
+
+
+class TikTokRunBatcher:
+    """
+    Micro-batches hashtag searches into shared actor runs.
+
+    The first request in a window becomes the leader: it waits window_seconds
+    for others to join, starts one run for the union of their hashtags and
+    hands every dataset item to the requests whose hashtags it matches.
+    Items without hashtag information go to every request in the batch.
+    """
+
+    def __init__(
+        self,
+        run_items: Callable[[List[str], int], Iterator[Dict]],
+        window_seconds: float = 0.25,
+        max_hashtags: int = 20,
+    ):
+        """
+        Args:
+            run_items: Runs the actor for (hashtags, resultsPerPage) and yields items
+            window_seconds: How long the leader collects requests
+            max_hashtags: A batch whose hashtag union reaches this is closed early
+        """
+        self.run_items = run_items
+        self.window_seconds = window_seconds
+        self.max_hashtags = max_hashtags
+        self.runs = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._pending: Optional[_TikTokBatch] = None
+
+    def submit(self, tags: List[str], results_per_page: int) -> List[Dict]:
+        """Block until the batched run has produced this request's items."""
+        request = _TikTokRunRequest(tags, results_per_page)
+        with self._lock:
+            self.requests += 1
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = _TikTokBatch()
+                self._pending = batch
+            batch.requests.append(request)
+            batch.tags |= request.tags
+            if len(batch.tags) >= self.max_hashtags:
+                self._pending = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window_seconds)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            self._run_batch(batch)
+        return request.future.result()
+
+    def _run_batch(self, batch: _TikTokBatch):
+        with self._lock:
+            self.runs += 1
+        logger.info(
+            "TikTok batch of %d searches, %d hashtags",
+            len(batch.requests),
+            len(batch.tags),
+        )
+        results_per_page = max(request.results_per_page for request in batch.requests)
+        waiting = list(batch.requests)
+        items = self.run_items(sorted(batch.tags), results_per_page)
+        try:
+            for item in items:
+                matched = _item_hashtags(item)
+                for request in waiting:
+                    if not matched or matched & request.tags:
+                        request.items.append(item)
+                waiting = [
+                    request
+                    for request in waiting
+                    if len(request.items) < request.wanted
+                ]
+                if not waiting:
+                    break
+        except Exception as e:
+            for request in batch.requests:
+                request.future.set_exception(e)
+            return
+        finally:
+            items.close()
+        for request in batch.requests:
+            request.future.set_result(request.items)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"runs": self.runs, "requests": self.requests}
+
 
 class TikTokVideoSearcher:
     """
     TikTok Scraper (Apify) client for hashtag-based video searches.
     """
 
-    def __init__(self, apify_token: str, actor_id: str = "clockworks/tiktok-scraper"):
+    def __init__(
+        self,
+        apify_token: str,
+        actor_id: str = "clockworks/tiktok-scraper",
+        run_mode: str = "sync",
+        run_timeout_seconds: float = 60.0,
+        poll_interval: float = 2.0,
+        batch_window_seconds: float = 0.0,
+        batch_max_hashtags: int = 20,
+    ):
+        """
+        Args:
+            apify_token: Apify API token
+            actor_id: TikTok scraper actor to run
+            run_mode: "sync" waits for the whole actor run; "async" starts it and
+                streams dataset items while the run is still producing them
+            run_timeout_seconds: Longest an async run is followed before it is
+                aborted and its partial results are used
+            poll_interval: Seconds between run status polls in async mode
+            batch_window_seconds: How long hashtag requests are collected into one
+                shared actor run (0 gives every search its own run)
+            batch_max_hashtags: Most hashtags submitted in one batched run
+        """
+        if run_mode not in ("sync", "async"):
+            raise ValueError(f"Unknown TikTok run mode '{run_mode}'")
         self.client = ApifyClient(apify_token)
         self.actor_id = actor_id
+        self.run_mode = run_mode
+        self.run_timeout_seconds = run_timeout_seconds
+        self.poll_interval = max(1, int(poll_interval))
+        self.batcher: Optional[TikTokRunBatcher] = None
+        if batch_window_seconds > 0:
+            self.batcher = TikTokRunBatcher(
+                lambda tags, count: self._run_items(self._run_input(tags, count)),
+                window_seconds=batch_window_seconds,
+                max_hashtags=batch_max_hashtags,
+            )
 
-    def search_videos(self, query: str, max_results: int = 25) -> List[Dict]:
-        def _extract_video_url(item: Dict) -> Optional[str]:
-            candidates: List[Optional[str]] = [
-                item.get("videoUrl"),
-                item.get("videoUrlNoWaterMark"),
-                item.get("video_url"),
-                item.get("downloadAddr"),
-                item.get("videoDownloadAddress"),
-            ]
+    def search_videos(self, query: str, max_results: int = 25) -> List[VideoRecord]:
+        results, _ = self.search_videos_page(query, max_results)
+        return results
 
-            video = item.get("video")
-            if isinstance(video, dict):
-                candidates.extend(
-                    [
-                        video.get("downloadAddr"),
-                        video.get("playAddr"),
-                        video.get("playAddrH264"),
-                        video.get("playAddrBytevc1"),
-                    ]
-                )
+    def search_videos_page(
+        self, query: str, max_results: int = 25, page_state: Optional[Dict] = None
+    ) -> Tuple[List[VideoRecord], Optional[Dict]]:
+        """
+        Fetch one page of hashtag videos and the state for the next page.
 
-                for key in ("playAddr", "downloadAddr"):
-                    nested = video.get(key)
-                    if isinstance(nested, dict):
-                        url_list = nested.get("urlList") or nested.get("url_list")
-                        if isinstance(url_list, list):
-                            candidates.extend(url_list)
-                        direct_url = nested.get("url") or nested.get("uri")
-                        if isinstance(direct_url, str):
-                            candidates.append(direct_url)
-
-            for value in candidates:
-                if isinstance(value, list):
-                    for entry in value:
-                        if isinstance(entry, str) and entry:
-                            return entry
-                if isinstance(value, str) and value:
-                    return value
-            return None
+        Each later page re-runs the actor max_results deeper per hashtag and
+        drops the videos that earlier pages already returned.
+        """
+        depth = (page_state or {}).get("depth", 0)
+        skip = list((page_state or {}).get("skip", []))
+        skipped = set(skip)
 
         tags = [
             re.sub(r"[^0-9A-Za-z_]", "", token)
@@ -67,7 +285,51 @@ class TikTokVideoSearcher:
         if not tags:
             tags = ["fyp"]
 
-        run_input = {
+        results: List[VideoRecord] = []
+        item_count = 0
+        items = self._hashtag_items(tags, depth + max_results)
+        try:
+            for item in items:
+                item_count += 1
+                web_url = item.get("webVideoUrl")
+                if not web_url:
+                    continue
+                match = re.search(r"/video/(\d+)", web_url)
+                video_id = match.group(1) if match else None
+                digest = _video_digest(video_id or web_url)
+                if digest in skipped:
+                    continue
+                skipped.add(digest)
+                skip.append(digest)
+                embed_url = (
+                    f"https://www.tiktok.com/embed/v2/{video_id}"
+                    if video_id
+                    else web_url
+                )
+                results.append(
+                    VideoRecord(
+                        video_id=video_id or web_url,
+                        title=item.get("text") or "TikTok clip",
+                        watch_url=web_url,
+                        embed_url=embed_url,
+                        video_url=_extract_video_url(item),
+                        source="tiktok",
+                    )
+                )
+                if len(results) >= max_results:
+                    break
+        finally:
+            # Stops a streaming run we no longer need.
+            items.close()
+
+        next_depth = depth + max_results
+        exhausted = len(results) < max_results and item_count < len(tags) * next_depth
+        if exhausted or next_depth >= TIKTOK_MAX_DEPTH:
+            return results, None
+        return results, {"depth": next_depth, "skip": skip[-TIKTOK_PAGE_SKIP_LIMIT:]}
+
+    def _run_input(self, tags: List[str], results_per_page: int) -> Dict:
+        return {
             "commentsPerPost": 0,
             "excludePinnedPosts": False,
             "hashtags": tags,
@@ -75,7 +337,7 @@ class TikTokVideoSearcher:
             "maxFollowingPerProfile": 0,
             "maxRepliesPerComment": 0,
             "proxyCountryCode": "None",
-            "resultsPerPage": max_results,
+            "resultsPerPage": results_per_page,
             "scrapeRelatedVideos": False,
             "shouldDownloadAvatars": False,
             "shouldDownloadCovers": False,
@@ -85,34 +347,85 @@ class TikTokVideoSearcher:
             "shouldDownloadVideos": False,
         }
 
-        run = self.client.actor(self.actor_id).call(run_input=run_input)
-        dataset_items = self.client.dataset(run["defaultDatasetId"]).list_items()
-        items = dataset_items.items or []
+    def _hashtag_items(self, tags: List[str], results_per_page: int) -> Iterator[Dict]:
+        if self.batcher is not None:
+            yield from self.batcher.submit(tags, results_per_page)
+            return
+        yield from self._run_items(self._run_input(tags, results_per_page))
 
-        results: List[Dict] = []
-        for item in items:
-            web_url = item.get("webVideoUrl")
-            if not web_url:
-                continue
-            match = re.search(r"/video/(\d+)", web_url)
-            video_id = match.group(1) if match else None
-            embed_url = (
-                f"https://www.tiktok.com/embed/v2/{video_id}" if video_id else web_url
-            )
-            video_url = _extract_video_url(item)
-            title = item.get("text") or "TikTok clip"
-            results.append(
-                {
-                    "video_id": video_id or web_url,
-                    "title": title,
-                    "watch_url": web_url,
-                    "embed_url": embed_url,
-                    "video_url": video_url,
-                    "source": "tiktok",
-                }
-            )
+    def _run_items(self, run_input: Dict) -> Iterator[Dict]:
+        if self.run_mode == "async":
+            return self._stream_run_items(run_input)
+        return self._call_run_items(run_input)
 
-        return results
+    def _call_run_items(self, run_input: Dict) -> Iterator[Dict]:
+        with stage("apify_run", "tiktok", ",".join(run_input["hashtags"])):
+            run = self.client.actor(self.actor_id).call(run_input=run_input)
+        yield from self._read_dataset(self.client.dataset(run["defaultDatasetId"]))
+
+    def _read_dataset(self, dataset, offset: int = 0) -> Iterator[Dict]:
+        """
+        Yield dataset items from offset onwards, one trimmed page at a time,
+        so a large run is never held in memory all at once.
+        """
+        while True:
+            with stage("apify_dataset", "tiktok", f"offset {offset}"):
+                page = dataset.list_items(
+                    offset=offset,
+                    limit=TIKTOK_DATASET_PAGE_SIZE,
+                    fields=TIKTOK_DATASET_FIELDS,
+                )
+            items = page.items or []
+            yield from items
+            offset += len(items)
+            if len(items) < TIKTOK_DATASET_PAGE_SIZE:
+                return
+
+    def _stream_run_items(self, run_input: Dict) -> Iterator[Dict]:
+        """
+        Start the actor without waiting for it and yield dataset items as
+        the run pushes them.
+
+        If the consumer stops early (it has enough videos) or the run takes
+        longer than run_timeout_seconds, the run is aborted so it stops
+        using Apify compute.
+        """
+        with stage("apify_start", "tiktok", ",".join(run_input["hashtags"])):
+            run = self.client.actor(self.actor_id).start(run_input=run_input)
+        run_client = self.client.run(run["id"])
+        dataset = self.client.dataset(run["defaultDatasetId"])
+        deadline = time.monotonic() + self.run_timeout_seconds
+        offset = 0
+        finished = False
+        try:
+            while True:
+                for item in self._read_dataset(dataset, offset):
+                    offset += 1
+                    yield item
+
+                if finished:
+                    return
+                if time.monotonic() >= deadline:
+                    logger.warning(
+                        "TikTok run %s still running after %.0fs, using partial results",
+                        run["id"],
+                        self.run_timeout_seconds,
+                    )
+                    return
+
+                # Blocks server-side until the run finishes or the wait ends,
+                # so this doubles as the poll interval.
+                with stage("apify_wait", "tiktok"):
+                    run = (
+                        run_client.wait_for_finish(wait_secs=self.poll_interval) or run
+                    )
+                finished = run.get("status") in APIFY_TERMINAL_STATUSES
+        finally:
+            if not finished:
+                try:
+                    run_client.abort()
+                except Exception as e:
+                    logger.debug("Could not abort TikTok run %s: %s", run["id"], e)
 
 
 class InstagramReelsSearcher:
@@ -125,35 +438,142 @@ class InstagramReelsSearcher:
         access_token: str,
         user_id: str,
         base_url: str = "https://graph.facebook.com/v20.0",
+        session: Optional[requests.Session] = None,
+        hashtag_index: Optional[HashtagIndex] = None,
+        max_hashtags: int = 3,
+        page_deadline_seconds: float = 15.0,
     ):
+        """
+        Args:
+            access_token: Graph API access token
+            user_id: Instagram business account ID used for hashtag search
+            base_url: Graph API base URL including the version
+            session: Shared HTTP session so connections are reused across calls
+            hashtag_index: Durable hashtag ID index consulted before ig_hashtag_search
+            max_hashtags: Hashtags derived from a query and searched in parallel
+            page_deadline_seconds: Time budget for following paging.next on one page
+        """
         self.access_token = access_token
         self.user_id = user_id
         self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.hashtag_index = hashtag_index
+        self.max_hashtags = max(1, max_hashtags)
+        self.page_deadline_seconds = page_deadline_seconds
+
+    def search_reels(self, query: str, max_results: int = 25) -> List[VideoRecord]:
+        results, _ = self.search_reels_page(query, max_results)
+        return results
+
+    def search_reels_page(
+        self, query: str, max_results: int = 25, page_state: Optional[Dict] = None
+    ) -> Tuple[List[VideoRecord], Optional[Dict]]:
+        """
+        Fetch one page of reels from several hashtags derived from the query.
 
-    def search_reels(self, query: str, max_results: int = 25) -> List[Dict]:
-        hashtag = self._normalize_hashtag(query)
-        if not hashtag:
-            return []
+        The hashtags' recent_media feeds are fetched concurrently and merged
+        round-robin, deduplicated by media ID. Each feed follows paging.next
+        until the page is full, the feed runs out or the page deadline passes.
 
-        hashtag_id = self._get_hashtag_id(hashtag)
-        if not hashtag_id:
-            logger.warning("Instagram hashtag search returned no results for '%s'", hashtag)
-            return []
+        Returns:
+            Tuple of (reels, state for the next page or None). The state holds
+            the Graph API after-cursor of every hashtag that has more media.
+        """
+        cursors = (page_state or {}).get("after")
+        if isinstance(cursors, dict):
+            hashtags = list(cursors)
+        else:
+            cursors = {}
+            hashtags = self._derive_hashtags(query)
+        if not hashtags:
+            return [], None
 
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_hashtags, len(hashtags)),
+            thread_name_prefix="instagram-hashtag",
+        ) as pool:
+            resolved = dict(
+                zip(hashtags, pool.map(in_context(self._get_hashtag_id), hashtags))
+            )
+            feeds = {
+                hashtag: cursors.get(hashtag)
+                for hashtag in hashtags
+                if resolved[hashtag]
+            }
+            if not feeds:
+                logger.warning(
+                    "Instagram hashtag search returned no results for %s", hashtags
+                )
+                return [], None
+
+            deadline = time.monotonic() + self.page_deadline_seconds
+            per_feed: Dict[str, List[VideoRecord]] = {hashtag: [] for hashtag in feeds}
+            seen_ids = set()
+            collected = 0
+            # Each round fetches the next page of every feed that still has
+            # one, in parallel, until enough unique reels are in hand.
+            while feeds and collected < max_results and time.monotonic() < deadline:
+                # The feeds' limits add up to the reels still wanted, so no
+                # reel is fetched, and its cursor passed, only to be cut off.
+                # Feeds without a share this round keep their cursor.
+                remaining = max_results - collected
+                active = list(feeds.items())[:remaining]
+                base, extra = divmod(remaining, len(active))
+                limits = [
+                    min(INSTAGRAM_PAGE_LIMIT, base + (1 if index < extra else 0))
+                    for index in range(len(active))
+                ]
+                pages = pool.map(
+                    in_context(
+                        lambda item, limit: self._fetch_recent_media(
+                            resolved[item[0]], limit, item[1]
+                        )
+                    ),
+                    active,
+                    limits,
+                )
+                for (hashtag, _), (reels, after) in zip(active, pages):
+                    for reel in reels:
+                        if reel.video_id in seen_ids:
+                            continue
+                        seen_ids.add(reel.video_id)
+                        per_feed[hashtag].append(reel)
+                        collected += 1
+                    if after:
+                        feeds[hashtag] = after
+                    else:
+                        del feeds[hashtag]
+
+        results = [
+            reel
+            for group in itertools.zip_longest(*per_feed.values())
+            for reel in group
+            if reel is not None
+        ]
+        if not feeds:
+            return results, None
+        return results, {"after": feeds}
+
+    def _fetch_recent_media(
+        self, hashtag_id: str, limit: int, after: Optional[str] = None
+    ) -> Tuple[List[VideoRecord], Optional[str]]:
         url = f"{self.base_url}/{hashtag_id}/recent_media"
         params = {
             "user_id": self.user_id,
             "fields": "id,caption,media_type,media_url,permalink,thumbnail_url",
-            "limit": max_results,
+            "limit": limit,
             "access_token": self.access_token,
         }
+        if after:
+            params["after"] = after
 
-        response = requests.get(url, params=params, timeout=20)
-        response.raise_for_status()
+        with stage("ig_recent_media", "instagram", hashtag_id):
+            response = self.session.get(url, params=params, timeout=20)
+            response.raise_for_status()
+            data = response.json()
 
-        data = response.json()
         media_items = data.get("data", [])
-        results: List[Dict] = []
+        results: List[VideoRecord] = []
 
         for media in media_items:
             media_type = media.get("media_type")
@@ -173,39 +593,100 @@ class InstagramReelsSearcher:
             )
 
             results.append(
-                {
-                    "video_id": video_id,
-                    "title": media.get("caption") or "Untitled Reel",
-                    "watch_url": permalink or "",
-                    "embed_url": embed_url or "",
-                    "source": "instagram",
-                }
+                VideoRecord(
+                    video_id=video_id,
+                    title=media.get("caption") or "Untitled Reel",
+                    watch_url=permalink or "",
+                    embed_url=embed_url or "",
+                    source="instagram",
+                )
             )
 
-        return results
+        return results, self._next_cursor(data.get("paging") or {})
+
+    def _next_cursor(self, paging: Dict) -> Optional[str]:
+        next_url = paging.get("next")
+        if not next_url:
+            return None
+        after = (paging.get("cursors") or {}).get("after")
+        if after:
+            return after
+        values = parse_qs(urlparse(next_url).query).get("after")
+        return values[0] if values else None
 
     def _get_hashtag_id(self, hashtag: str) -> Optional[str]:
+        if self.hashtag_index is None:
+            return self._lookup_hashtag_id(hashtag)
+
+        hashtag_id = self.hashtag_index.get(hashtag)
+        if hashtag_id is not None:
+            return hashtag_id or None
+        if not self.hashtag_index.reserve_lookup(hashtag):
+            logger.warning(
+                "Instagram hashtag lookup budget exhausted, skipping '%s'", hashtag
+            )
+            return None
+
+        hashtag_id = self._lookup_hashtag_id(hashtag)
+        self.hashtag_index.set(hashtag, hashtag_id)
+        return hashtag_id
+
+    def _lookup_hashtag_id(self, hashtag: str) -> Optional[str]:
         url = f"{self.base_url}/ig_hashtag_search"
         params = {
             "user_id": self.user_id,
             "q": hashtag,
             "access_token": self.access_token,
         }
-        response = requests.get(url, params=params, timeout=20)
-        response.raise_for_status()
+        with stage("ig_hashtag_search", "instagram", hashtag):
+            response = self.session.get(url, params=params, timeout=20)
+            response.raise_for_status()
+            data = response.json()
 
-        data = response.json()
         matches = data.get("data", [])
         if not matches:
             return None
         return matches[0].get("id")
 
-    def _normalize_hashtag(self, query: str) -> str:
-        tokens = re.split(r"\s+", query.strip())
-        if not tokens:
-            return ""
-        token = re.sub(r"[^0-9A-Za-z_]", "", tokens[0])
-        return token.lower()
+    def _derive_hashtags(self, query: str) -> List[str]:
+        """
+        Hashtags for a query, up to max_hashtags.
+
+        Candidates are the first keyword (the old single-hashtag behaviour),
+        adjacent keywords run together ("data science" -> #datascience), then
+        the remaining keywords. Those the hashtag index already resolved come
+        first, since they cost no lookup, and known misses are dropped. Every
+        new hashtag spends one of the weekly unique lookups, so unresolved
+        run-together pairs only fill the slots the plain keywords leave, and
+        only while more than BIGRAM_LOOKUP_RESERVE of that budget is left.
+        """
+        words = [
+            re.sub(r"[^0-9a-z_]", "", token)
+            for token in query.lower().split()
+            if token.strip(".,!?") not in STOPWORDS
+        ]
+        words = list(dict.fromkeys(word for word in words if word))
+        bigrams = [first + second for first, second in zip(words, words[1:])]
+        if self.hashtag_index is None:
+            return words[: self.max_hashtags]
+
+        index = self.hashtag_index
+        try_bigrams = (
+            index.lookups_remaining() > index.lookup_limit * BIGRAM_LOOKUP_RESERVE
+        )
+        known: List[str] = []
+        unresolved_words: List[str] = []
+        unresolved_bigrams: List[str] = []
+        for candidate in dict.fromkeys(words[:1] + bigrams + words[1:]):
+            hashtag_id = index.peek(candidate)
+            if hashtag_id:
+                known.append(candidate)
+            elif hashtag_id is None and candidate in words:
+                unresolved_words.append(candidate)
+            elif hashtag_id is None and try_bigrams:
+                unresolved_bigrams.append(candidate)
+        hashtags = known + unresolved_words + unresolved_bigrams
+        return hashtags[: self.max_hashtags]
 
     def _extract_shortcode(self, permalink: Optional[str]) -> Optional[str]:
         if not permalink:
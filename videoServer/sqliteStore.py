@@ -0,0 +1,42 @@
+"""
+Per-thread SQLite connections for the on-disk stores.
+
+The result cache, quota ledger, hashtag index and seen store each keep a
+SQLite file that every uvicorn worker on the host shares, and each is used
+from the event loop's worker threads as well as the searchers' pools.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class ThreadLocalSQLite:
+    """
+    A SQLite file with one connection per thread, opened on first use.
+
+    sqlite3 connections cannot be shared between threads. Connections are
+    in autocommit mode and use WAL, so readers in other workers are not
+    blocked while one of them writes, with synchronous=NORMAL.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file; its directory is created if missing
+        """
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
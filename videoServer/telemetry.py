@@ -0,0 +1,233 @@
+"""
+Stage timings for the search hot path.
+
+stage() times a block of upstream work. Each timing feeds a process-wide
+histogram exported in Prometheus text format, and is also appended to the
+collector of the request that caused it (found through a contextvar) so it
+can be returned in that request's Server-Timing header.
+
+The request context reaches worker threads through SourceExecutor, which
+copies it; thread pools inside the searchers must wrap their callables with
+in_context() for the same reason.
+"""
+
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_TOKEN = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: Labels, le: Optional[str] = None) -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count.
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in sorted(self._series.items())
+            ]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_label_text(labels, str(bound))} {cumulative}"
+                )
+            lines.append(f"{self.name}_bucket{_label_text(labels, '+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{self.name}_count{_label_text(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label set."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        lines.extend(
+            f"{self.name}{_label_text(labels)} {value}" for labels, value in snapshot
+        )
+        return lines
+
+
+def render_samples(
+    name: str, metric_type: str, help_text: str, samples: List[Tuple[Dict, float]]
+) -> List[str]:
+    """Render values read from elsewhere (cache stats, quota) as one metric."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    lines.extend(
+        f"{name}{_label_text(tuple(sorted(labels.items())))} {value}"
+        for labels, value in samples
+    )
+    return lines
+
+
+STAGE_SECONDS = Histogram(
+    "reelearners_stage_duration_seconds",
+    "Time spent in one stage of upstream work.",
+)
+STAGE_ERRORS = Counter(
+    "reelearners_upstream_errors_total",
+    "Upstream calls that raised, by stage.",
+)
+REQUEST_SECONDS = Histogram(
+    "reelearners_http_request_duration_seconds",
+    "Time to produce the response (excluding streamed bodies), by route.",
+)
+
+
+class TimingCollector:
+    """Stage timings recorded while serving one request."""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, float, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, description: str = ""):
+        with self._lock:
+            self.entries.append((name, seconds, description))
+
+    def server_timing(self, limit: int = 40) -> str:
+        """Format the entries as a Server-Timing header value."""
+        with self._lock:
+            entries = list(self.entries[:limit])
+        used: Dict[str, int] = {}
+        metrics = []
+        for name, seconds, description in entries:
+            token = _TOKEN.sub("_", name)
+            used[token] = used.get(token, 0) + 1
+            if used[token] > 1:
+                token = f"{token}-{used[token]}"
+            metric = f"{token};dur={seconds * 1000:.1f}"
+            if description:
+                # Descriptions can carry user text (prompts, topics), and
+                # header values must be Latin-1, so anything outside printable
+                # ASCII (and the quote and backslash) is percent-encoded.
+                clean = quote(description[:60], safe=" !#$&'()*+,-./:;<=>?@[]^_`{|}~")
+                metric += f';desc="{clean}"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+_collector: contextvars.ContextVar[Optional[TimingCollector]] = contextvars.ContextVar(
+    "timing_collector", default=None
+)
+
+
+def start_collecting() -> Tuple[TimingCollector, contextvars.Token]:
+    collector = TimingCollector()
+    return collector, _collector.set(collector)
+
+
+def stop_collecting(token: contextvars.Token):
+    _collector.reset(token)
+
+
+@contextmanager
+def stage(name: str, source: str = "", detail: str = "") -> Iterator[None]:
+    """
+    Time a block of upstream work.
+
+    Args:
+        name: Stage name, used as the histogram label and Server-Timing metric
+        source: Source the work is for (youtube, tiktok, instagram)
+        detail: Free text for Server-Timing only (e.g. the topic), never a label
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name, source=source)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name, source=source)
+        collector = _collector.get()
+        if collector is not None:
+            collector.add(name, elapsed, detail)
+
+
+def in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Bind fn to the caller's context so calls from a thread pool still report
+    to the current request. Every call runs in its own copy, since one
+    Context cannot be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
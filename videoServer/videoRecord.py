@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class VideoRecord:
+    """
+    One search result, in the shape every searcher returns.
+
+    Records are immutable, so a cached page can be handed to any number of
+    requests without copying. The result cache's disk tier stores them as
+    field lists in declaration order; from_cached() reads them back.
+    """
+
+    video_id: str
+    title: str
+    watch_url: str
+    embed_url: str
+    video_url: Optional[str] = None
+    source: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """The record as a VideoResponse-shaped dict."""
+        return {
+            "video_id": self.video_id,
+            "title": self.title,
+            "watch_url": self.watch_url,
+            "embed_url": self.embed_url,
+            "video_url": self.video_url,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_cached(cls, value: Any) -> "VideoRecord":
+        """
+        Rebuild a record read back from the result cache.
+
+        Args:
+            value: A VideoRecord, a field list from the disk tier, or a dict
+                written before results were stored as records
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls(
+                value["video_id"],
+                value["title"],
+                value["watch_url"],
+                value["embed_url"],
+                value.get("video_url"),
+                value.get("source"),
+            )
+        return cls(*value)
@@ -0,0 +1,210 @@
+"""
+YouTube Data API quota accounting.
+
+Every call is charged in quota units against a daily limit (10,000 by
+default) that resets at midnight Pacific Time. search.list is by far the
+most expensive call, so the number of topics a search fans out to is what
+the ledger mostly has to ration.
+"""
+
+import datetime
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from sqliteStore import ThreadLocalSQLite
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except (ImportError, ZoneInfoNotFoundError):
+    # No tz database; PST is close enough to find the reset day.
+    QUOTA_TIMEZONE = datetime.timezone(datetime.timedelta(hours=-8))
+
+logger = logging.getLogger(__name__)
+
+QUOTA_COSTS = {
+    "search.list": 100,
+    "videos.list": 1,
+}
+
+
+def quota_day(now: Optional[datetime.datetime] = None) -> str:
+    now = now or datetime.datetime.now(QUOTA_TIMEZONE)
+    return now.astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+
+class QuotaLedger:
+    """
+    Units spent per call type for the current quota day.
+
+    With a path the ledger is kept in SQLite, so restarts and the other
+    workers on the host see the same totals.
+    """
+
+    def __init__(
+        self,
+        daily_limit: int = 10000,
+        path: Optional[str] = None,
+        low_quota_fraction: float = 0.1,
+    ):
+        """
+        Args:
+            daily_limit: Units the project may spend per day
+            path: SQLite file for the ledger (None keeps it in memory)
+            low_quota_fraction: Share of the daily limit below which searches
+                fall back to a single topic
+        """
+        self.daily_limit = daily_limit
+        self.low_quota_fraction = low_quota_fraction
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Dict[str, list]] = defaultdict(
+            lambda: defaultdict(lambda: [0, 0])
+        )
+        self._exhausted_day: Optional[str] = None
+        self._db: Optional[ThreadLocalSQLite] = None
+        if path:
+            self._db = ThreadLocalSQLite(path)
+            self._db.connection().execute(
+                "CREATE TABLE IF NOT EXISTS quota ("
+                " day TEXT NOT NULL,"
+                " call_type TEXT NOT NULL,"
+                " calls INTEGER NOT NULL,"
+                " units INTEGER NOT NULL,"
+                " PRIMARY KEY (day, call_type))"
+            )
+            # quotaExceeded seen by any worker marks the day spent for all.
+            self._db.connection().execute(
+                "CREATE TABLE IF NOT EXISTS exhausted (day TEXT PRIMARY KEY)"
+            )
+
+    def charge(self, call_type: str, calls: int = 1):
+        """Record calls of one type; the API bills them even when they fail."""
+        units = QUOTA_COSTS[call_type] * calls
+        day = quota_day()
+        if self.path:
+            try:
+                self._db.connection().execute(
+                    "INSERT INTO quota (day, call_type, calls, units)"
+                    " VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (day, call_type) DO UPDATE SET"
+                    " calls = calls + excluded.calls, units = units + excluded.units",
+                    (day, call_type, calls, units),
+                )
+                return
+            except sqlite3.Error as e:
+                logger.warning(f"Quota ledger write failed: {e}")
+        with self._lock:
+            totals = self._memory[day][call_type]
+            totals[0] += calls
+            totals[1] += units
+
+    def mark_exhausted(self):
+        """The API reported quotaExceeded; treat the rest of the day as spent."""
+        day = quota_day()
+        with self._lock:
+            self._exhausted_day = day
+        if self.path:
+            try:
+                self._db.connection().execute(
+                    "INSERT OR IGNORE INTO exhausted (day) VALUES (?)", (day,)
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Quota ledger write failed: {e}")
+        logger.warning("YouTube quota exhausted for %s", day)
+
+    def is_exhausted(self) -> bool:
+        day = quota_day()
+        with self._lock:
+            if self._exhausted_day == day:
+                return True
+        if not self.path:
+            return False
+        try:
+            row = (
+                self._db.connection()
+                .execute("SELECT 1 FROM exhausted WHERE day = ?", (day,))
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Quota ledger read failed: {e}")
+            return False
+        if row is not None:
+            with self._lock:
+                self._exhausted_day = day
+        return row is not None
+
+    def by_call_type(self, day: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        day = day or quota_day()
+        rows = None
+        if self.path:
+            try:
+                rows = self._db.connection().execute(
+                    "SELECT call_type, calls, units FROM quota WHERE day = ?", (day,)
+                )
+                rows = rows.fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Quota ledger read failed: {e}")
+        if rows is None:
+            with self._lock:
+                rows = [
+                    (call_type, calls, units)
+                    for call_type, (calls, units) in self._memory[day].items()
+                ]
+        return {
+            call_type: {"calls": calls, "units": units}
+            for call_type, calls, units in rows
+        }
+
+    def spent(self) -> int:
+        return sum(entry["units"] for entry in self.by_call_type().values())
+
+    def remaining(self) -> int:
+        if self.is_exhausted():
+            return 0
+        return max(0, self.daily_limit - self.spent())
+
+    def is_low(self) -> bool:
+        return self.remaining() < self.daily_limit * self.low_quota_fraction
+
+    def affordable_topics(self, requested: int, budget: Optional[int] = None) -> int:
+        """
+        Number of topics a search can fan out to.
+
+        Each topic costs one search.list call; a couple of units are kept for
+        the videos.list lookups that follow.
+
+        Args:
+            requested: Topics the search would like to use
+            budget: Units this one request may spend (None for no cap)
+        """
+        available = self.remaining()
+        if budget is not None:
+            available = min(available, budget)
+        lookups = QUOTA_COSTS["videos.list"] * 2
+        topics = min(requested, (available - lookups) // QUOTA_COSTS["search.list"])
+        if self.is_low():
+            topics = min(topics, 1)
+        return max(0, topics)
+
+    def stats(self) -> Dict[str, Any]:
+        now = datetime.datetime.now(QUOTA_TIMEZONE)
+        midnight = datetime.datetime.combine(
+            now.date() + datetime.timedelta(days=1), datetime.time(), now.tzinfo
+        )
+        by_call = self.by_call_type()
+        spent = sum(entry["units"] for entry in by_call.values())
+        remaining = self.remaining()
+        return {
+            "day": quota_day(now),
+            "daily_limit": self.daily_limit,
+            "spent": spent,
+            "remaining": remaining,
+            "low": remaining < self.daily_limit * self.low_quota_fraction,
+            "resets_in_seconds": int((midnight - now).total_seconds()),
+            "calls": by_call,
+        }